@@ -0,0 +1,162 @@
+from pathlib import Path
+
+import numpy as np
+
+
+def _h5py():
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError(
+            'reading .a5 files requires h5py; install apt[a5]') from e
+    return h5py
+
+
+class A5File():
+
+    def __init__(self, a5_file: Path):
+        self._a5_file = a5_file
+        self._fh = _h5py().File(a5_file, 'r')
+        self._tables = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._fh.close()
+
+    @property
+    def tables(self):
+        if self._tables is None:
+            self._tables = _find_tables(self._fh)
+        return list(self._tables)
+
+    def columns(self, table: str):
+        return list(self._table(table)['columns'])
+
+    def n_rows(self, table: str):
+        return self._table(table)['n_rows']
+
+    def read_table(self, table: str, start: int = 0, stop: int = None):
+        entry = self._table(table)
+
+        if entry['compound']:
+            data = self._fh[table][start:stop]
+            return {x: _decode(data[x]) for x in entry['columns']}
+
+        group = self._fh[table]
+        return {x: _decode(group[x][start:stop]) for x in entry['columns']}
+
+    def iter_table(self, table: str, chunk_rows: int = 100000):
+        n_rows = self.n_rows(table)
+        for start in range(0, n_rows, chunk_rows):
+            yield self.read_table(table, start, min(start + chunk_rows,
+                                                    n_rows))
+
+    def matrix(
+        self,
+        table: str,
+        columns: list = None,
+        start: int = 0,
+        stop: int = None,
+        dtype=np.float32,
+    ):
+        data = self.read_table(table, start, stop)
+
+        if columns is None:
+            columns = [k for k, v in data.items() if v.dtype.kind in 'fiu']
+
+        return np.column_stack([data[x].astype(dtype) for x in columns])
+
+    def _table(self, table):
+        if self._tables is None:
+            self._tables = _find_tables(self._fh)
+        if table not in self._tables:
+            raise Exception(f'{self._a5_file}: no table {table}')
+        return self._tables[table]
+
+
+def summary_table(a5: A5File):
+    for table in a5.tables:
+        columns = a5.columns(table)
+        if len(columns) > 1 and 'probeset_id' in columns:
+            return table
+
+    raise Exception('no summary table found')
+
+
+def summaries_iter(a5_file: Path, chunk_rows: int = 100000):
+    with A5File(a5_file) as a5:
+        table = summary_table(a5)
+        samples = [x for x in a5.columns(table) if x != 'probeset_id']
+
+        for start in range(0, a5.n_rows(table), chunk_rows):
+            stop = start + chunk_rows
+            data = a5.read_table(table, start, stop)
+            yield {
+                'probeset_ids': data['probeset_id'],
+                'samples': samples,
+                'signals': np.column_stack(
+                    [data[x].astype(np.float32) for x in samples]),
+            }
+
+
+def export_summaries(
+    a5_file: Path,
+    output_file: Path,
+    precision: int = 5,
+    chunk_rows: int = 100000,
+):
+    with output_file.open('wt') as fh:
+        header = None
+        for chunk in summaries_iter(a5_file, chunk_rows):
+            if header is None:
+                header = '\t'.join(['probeset_id', *chunk['samples']])
+                fh.write(f'{header}\n')
+            for probeset_id, signals in zip(chunk['probeset_ids'],
+                                            chunk['signals']):
+                values = '\t'.join(f'{x:.{precision}f}' for x in signals)
+                fh.write(f'{probeset_id}\t{values}\n')
+
+    return output_file
+
+
+def _find_tables(fh):
+    h5py = _h5py()
+    tables = dict()
+
+    def visit(name, obj):
+        if isinstance(obj, h5py.Dataset) and obj.dtype.names:
+            tables[name] = {
+                'columns': list(obj.dtype.names),
+                'n_rows': obj.shape[0],
+                'compound': True,
+            }
+        elif isinstance(obj, h5py.Group):
+            datasets = [
+                (k, v) for k, v in obj.items()
+                if isinstance(v, h5py.Dataset) and v.ndim == 1
+                and not v.dtype.names
+            ]
+            n_rows = {v.shape[0] for _, v in datasets}
+            if datasets and len(n_rows) == 1:
+                tables[name] = {
+                    'columns': [k for k, _ in datasets],
+                    'n_rows': n_rows.pop(),
+                    'compound': False,
+                }
+
+    fh.visititems(visit)
+
+    return tables
+
+
+def _decode(values):
+    if values.dtype.kind in ('S', 'O'):
+        return np.array([
+            x.decode() if isinstance(x, bytes) else x for x in values
+        ])
+    return values
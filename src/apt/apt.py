@@ -11,10 +11,10 @@ from datetime import datetime
 from pathlib import Path
 from subprocess import PIPE, STDOUT, Popen
 
-import pandas as pd
-
 from . import config, utils
 
+_APT_CMDS = dict()
+
 
 class Apt():
 
@@ -28,16 +28,19 @@ class Apt():
         bin_dirs.extend(config.BIN_DIRS)
         bin_dirs.append(os.environ['PATH'])
 
-        apt_cmds = utils.find_apt_cmds(config.APT_PROGRAMS, bin_dirs)
+        apt_cmds = _find_apt_cmds(config.APT_PROGRAMS, bin_dirs)
 
         self.cmd_paths = apt_cmds
 
+        self._enscript_ok = None
+
+    @property
+    def enscript_ok(self):
         # test to see if enscript works, if not we will use paps.  this primarily an issue
         # under Docker, since enscript refuses to run if the current user is not in /etc/passwd
-        if shutil.which('enscript'):
-            self._enscript_ok = True
-        else:
-            self._enscript_ok = False
+        if self._enscript_ok is None:
+            self._enscript_ok = bool(shutil.which('enscript'))
+        return self._enscript_ok
 
     @property
     def apt_bin_dir(self):
@@ -118,7 +121,7 @@ class Apt():
         return Command(cmd, check_log=True)
 
     def apt_geno_qc(self, lib_dir, args_file, cel_files, output_dir, force):
-        executable = self.cmd_paths['apt-geno-qc']
+        executable = self.cmd_paths['apt-geno-qc-axiom']
         cmd = (
             ''
             f"{executable}\n"
@@ -252,13 +255,15 @@ class Apt():
             f"    --out-dir                       {output_dir}\n"
             f"    --analysis-files-path           {lib_dir}\n"
             f"    --arg-file                      {args_file}\n"
-        # f"    --use-text-format-summary-file  true\n"
             f"    --reference-file                {cnref_file}\n"
             f"    --log-file                      {log_file}\n"
             f"    --loh-calls-file                {calls_file}\n"
             f"    --loh-confidences-file          {confidences_file}\n"
             '')
 
+        if Path(summary_file).suffix == '.txt':
+            cmd += "    --use-text-format-summary-file  true\n"
+
         return Command(cmd, check_log=True)
 
     def apt_copynumber_axiom_cnvmix(
@@ -282,10 +287,12 @@ class Apt():
             f"    --analysis-files-path    	{lib_dir}\n"
             f"    --arg-file               	{args_file}\n"
             f"    --reference-file         	{cnref_file}\n"
-            f"    --use-text-format-summary-file true\n"
             f"    --log-file               	{output_dir / 'apt-copynumber-axiom-cnvmix.log'}\n"
             '')
 
+        if Path(summary_file).suffix == '.txt':
+            cmd += "    --use-text-format-summary-file true\n"
+
         if cn_controls_file:
             cmd += f"    --controls-file        {cn_controls_file}\n"
 
@@ -345,7 +352,6 @@ class Apt():
                f'    --batch-folder        {batch_folder}     \n'
                f'    --genotype-data-dir   {genotype_data_dir}\n'
                f'    --performance-file    {performance_file} \n'
-               f'    --geno-qc-res-file    {geno_qc_file}     \n'
                '')
         if geno_qc_file and geno_qc_file.exists():
             cmd += f'    --geno-qc-res-file    {geno_qc_file}     \n'
@@ -504,13 +510,18 @@ class Apt():
             f'    --snp-posteriors-output                       true                 \n'
             f'    --genotyping-node:snp-posteriors-output-file  {posteriors_file}    \n'
             f'    --summary-input-file                          {summary_file}       \n'
-            f'    --artifact-reduction-trustcheck-file          {trustcheck_file}    \n'
-            f'    --read-genders                                {gender_file}        \n'
             f'    --genotyping-node:snp-priors-input-file       {priors_file}        \n'
-            f'    --snp-specific-param-file                     {params_file}        \n'
-            f'    --special-snps                                {special_snps_file}  \n'
             '')
 
+        if trustcheck_file:
+            cmd += f'    --artifact-reduction-trustcheck-file          {trustcheck_file}    \n'
+        if gender_file:
+            cmd += f'    --read-genders                                {gender_file}        \n'
+        if params_file:
+            cmd += f'    --snp-specific-param-file                     {params_file}        \n'
+        if special_snps_file:
+            cmd += f'    --special-snps                                {special_snps_file}  \n'
+
         # if rare_het_adjustment:
         #     cmd += "    --do-rare-het-adjustment                       true\n"
         #     cmd += "    --genotyping-node:@low-sdDist-minor-cutoff-4   -10\n"
@@ -684,6 +695,64 @@ class Apt():
         return Command(cmd, check_log=True)
 
 
+def _find_apt_cmds(apt_cmds, bin_dirs):
+
+    dirs = [
+        x for bin_dir in bin_dirs for x in str(bin_dir).split(os.pathsep)
+        if x
+    ]
+    mtimes = [_mtime_ns(x) for x in dirs]
+    key = os.pathsep.join(dirs)
+
+    cached = _APT_CMDS.get(key)
+    if cached is None:
+        cached = _load_apt_cmds_cache().get(key)
+
+    if (cached and cached['mtimes'] == mtimes
+            and all(x in cached['cmd_paths'] for x in apt_cmds)):
+        _APT_CMDS[key] = cached
+        return {x: cached['cmd_paths'][x] for x in apt_cmds}
+
+    cmd_paths = utils.find_apt_cmds(apt_cmds, bin_dirs)
+
+    cached = {'mtimes': mtimes, 'cmd_paths': cmd_paths}
+    _APT_CMDS[key] = cached
+    _save_apt_cmds_cache(key, cached)
+
+    return cmd_paths
+
+
+def _mtime_ns(dirpath):
+    try:
+        return os.stat(dirpath).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_apt_cmds_cache():
+    try:
+        with config.APT_CMDS_CACHE_FILE.open('rt') as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return dict()
+
+
+def _save_apt_cmds_cache(key, value):
+    cache = _load_apt_cmds_cache()
+    cache[key] = value
+
+    cache_file = config.APT_CMDS_CACHE_FILE
+    tmp_file = cache_file.with_name(f'{cache_file.name}.{os.getpid()}')
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_file.open('wt') as fh:
+            json.dump(cache, fh)
+        tmp_file.replace(cache_file)
+    except OSError:
+        logging.debug(f'cannot write {cache_file}')
+
+
 class Command():
 
     def __init__(self, cmd, check_log=False):
@@ -733,7 +802,7 @@ class Command():
             logging.info(exit_status)
             raise Exception(f'Error: {cmd}')
 
-    def _apt_crashed(self, apt_log_file):
+    def apt_crashed(self, apt_log_file):
 
         with open(apt_log_file, 'rt') as fd:
             for line in fd:
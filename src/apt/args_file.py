@@ -0,0 +1,38 @@
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+from . import utils
+
+_ARGS_FILES = dict()
+
+
+def read_args_file(args_file: Path):
+    args_file = Path(args_file)
+    current_fingerprint = utils.fingerprint(args_file)
+
+    cached = _ARGS_FILES.get(args_file)
+    if cached and cached['fingerprint'] == current_fingerprint:
+        return cached['args']
+
+    args = dict()
+
+    for _, element in ET.iterparse(str(args_file)):
+        if element.tag == 'Parameter':
+            key = (element.get('analysis', ''), element.get('name', ''))
+            args.setdefault(key, element.get('currentValue', ''))
+        element.clear()
+
+    _ARGS_FILES[args_file] = {
+        'fingerprint': current_fingerprint,
+        'args': args,
+    }
+
+    return args
+
+
+def process_multi_alleles(args: dict):
+    for (_, name), value in args.items():
+        if name == 'process-multi-alleles' and value == 'true':
+            return True
+
+    return False
@@ -1,9 +1,9 @@
 import json
-import xml
 from enum import Enum
 from pathlib import Path
 
-from . import utils
+from .args_file import process_multi_alleles, read_args_file
+from .library import get_manifest
 from .thresholds import Thresholds
 
 Key = Enum('Key', [
@@ -39,18 +39,18 @@ class SampleQcArguments():
     ):
 
         self._lib_dir = lib_dir
+        self._manifest = get_manifest(lib_dir)
         self._thresholds = thresholds
         self._step1_args = dict()
         if not step1_args_file:
-            step1_args_file = utils.find_file(lib_dir, '*Step1*.xml')
+            step1_args_file = self._manifest.find_file('*Step1*.xml')
         if not geno_qc_args_file:
-            geno_qc_args_file = utils.find_file(lib_dir,
-                                                '*apt-geno-qc.AxiomQC1.xml')
+            geno_qc_args_file = self._manifest.find_file(
+                '*apt-geno-qc.AxiomQC1.xml')
 
         self._step1_args_file = step1_args_file
         self._geno_qc_args_file = geno_qc_args_file
-        self._step1_args_dom = xml.dom.minidom.parse(
-            str(self._step1_args_file))
+        self._step1_args_params = read_args_file(self._step1_args_file)
 
     @property
     def lib_dir(self):
@@ -62,13 +62,13 @@ class SampleQcArguments():
             return self._step1_args[Key.GENDER_THRESHOLDS]
 
         female_threshold = _get_arg(
-            self._step1_args_dom,
+            self._step1_args_params,
             'igender-female-threshold',
             'raw-gender-node',
             converter=float,
         )
         male_threshold = _get_arg(
-            self._step1_args_dom,
+            self._step1_args_params,
             'igender-male-threshold',
             'raw-gender-node',
             converter=float,
@@ -118,9 +118,9 @@ class SampleQcArguments():
             return self._step1_args[Key.PROBESET_IDS_FILE]
 
         return self._lib_dir / _get_arg(
-            self._step1_args_dom,
+            self._step1_args_params,
             'probeset-ids',
-            'libary-file-node',
+            'library-file-node',
         )
 
     @probeset_ids_file.setter
@@ -141,7 +141,7 @@ class SampleQcArguments():
             return self._step1_args[Key.SNP_PRIORS_FILE]
 
         return self._lib_dir / _get_arg(
-            self._step1_args_dom,
+            self._step1_args_params,
             'snp-priors-input-file',
             'genotyping-node',
         )
@@ -150,6 +150,20 @@ class SampleQcArguments():
     def snp_priors_file(self, filepath):
         self._step1_args[Key.SNP_PRIORS_FILE] = filepath
 
+    @property
+    def special_snps_file(self):
+        filename = _get_arg(
+            self._step1_args_params,
+            'special-snps',
+            'library-file-node',
+            missing_ok=True,
+        )
+
+        if filename:
+            return self._lib_dir / filename
+
+        return None
+
 
 class SnvArguments():
 
@@ -160,11 +174,13 @@ class SnvArguments():
         args_file: Path = None,
     ):
 
+        self._manifest = get_manifest(lib_dir)
+
         if not args_file:
-            args_file = utils.find_file(lib_dir, '*Step2*.xml')
+            args_file = self._manifest.find_file('*Step2*.xml')
 
         self._args_file = args_file
-        self._args_dom = xml.dom.minidom.parse(str(self._args_file))
+        self._args_params = read_args_file(self._args_file)
         self._args = dict()
         self._lib_dir = lib_dir
         self._thresholds = thresholds
@@ -178,7 +194,7 @@ class SnvArguments():
         if Key.PSCT_FILE in self._args:
             return self._args[Key.PSCT_FILE]
 
-        return utils.find_file(self._lib_dir, '*psct', missing_ok=True)
+        return self._manifest.find_file('*psct', missing_ok=True)
 
     @psct_file.setter
     def psct_file(self, psct_file: Path):
@@ -187,12 +203,9 @@ class SnvArguments():
     @property
     def ps2snp_file(self):
         if self.multi_alleles:
-            return utils.find_file(
-                self._lib_dir,
-                '*.ps2multisnp_map.ps',
-            )
+            return self._manifest.find_file('*.ps2multisnp_map.ps')
         else:
-            return utils.find_file(self._lib_dir, '*.ps2snp_map.ps')
+            return self._manifest.find_file('*.ps2snp_map.ps')
 
     @property
     def genotype_p_value(self):
@@ -216,7 +229,7 @@ class SnvArguments():
     def probeset_ids_file(self):
         if Key.PROBESET_IDS_FILE in self._args:
             return self._args[Key.PROBESET_IDS_FILE]
-        return self._lib_dir / _get_arg(self._args_dom, 'probeset-ids',
+        return self._lib_dir / _get_arg(self._args_params, 'probeset-ids',
                                         'library-file-node')
 
     @probeset_ids_file.setter
@@ -228,7 +241,7 @@ class SnvArguments():
         if Key.SNP_PRIORS_FILE in self._args:
             return self._args[Key.SNP_PRIORS_FILE]
         return self._lib_dir / _get_arg(
-            self._args_dom, 'snp-priors-input-file', 'genotyping-node')
+            self._args_params, 'snp-priors-input-file', 'genotyping-node')
 
     @snp_priors_file.setter
     def snp_priors_file(self, filepath):
@@ -239,7 +252,7 @@ class SnvArguments():
         if Key.SNP_PARAMS_FILE in self._args:
             return self._args[Key.SNP_PARAMS_FILE]
         return self._lib_dir / _get_arg(
-            self._args_dom, 'snp-specific-param-file', 'library-file-node')
+            self._args_params, 'snp-specific-param-file', 'library-file-node')
 
     @snp_params_file.setter
     def snp_params_file(self, filepath):
@@ -247,7 +260,7 @@ class SnvArguments():
 
     @property
     def special_snps_file(self):
-        return self._lib_dir / _get_arg(self._args_dom, 'special-snps',
+        return self._lib_dir / _get_arg(self._args_params, 'special-snps',
                                         'library-file-node')
 
     @property
@@ -256,7 +269,7 @@ class SnvArguments():
             return self._args[Key.COPY_NUMBER_CALL_CODES]
 
         return _get_arg(
-            self._args_dom,
+            self._args_params,
             'use-copynumber-call-codes',
             'probeset-summarize-genotype-node',
             converter=lambda x: x.lower() == 'true',
@@ -290,24 +303,14 @@ class SnvArguments():
     @property
     def multi_priors_input_file(self):
         return self.lib_dir / _get_arg(
-            self._args_dom,
+            self._args_params,
             'multi-priors-input-file',
             'multi-genotyping-node',
         )
 
     @property
     def multi_alleles(self):
-        for element in self._args_dom.getElementsByTagName('Parameter'):
-            name = element.getAttribute('name')
-            value = element.getAttribute('currentValue')
-
-            if name != 'process-multi-alleles':
-                continue
-
-            if value == 'true':
-                return True
-
-        return False
+        return process_multi_alleles(self._args_params)
 
     @property
     def rare_het_adjustment(self):
@@ -339,9 +342,10 @@ class SnvArguments():
     def genotype_freq_file(self):
         if Key.GENOTYPE_FREQ_FILE in self._args:
             return self._args[Key.GENOTYPE_FREQ_FILE]
-        return utils.find_file(self._lib_dir,
-                               '.genotype_frequency.txt',
-                               missing_ok=True)
+        return self._manifest.find_file(
+            '.genotype_frequency.txt',
+            missing_ok=True,
+        )
 
     @genotype_freq_file.setter
     def genotype_freq_file(self, filepath: Path):
@@ -358,6 +362,7 @@ class CnvArguments():
     ):
 
         self._lib_dir = lib_dir
+        self._manifest = get_manifest(lib_dir)
         self._cn_controls_file = cn_controls_file
         self._thresholds = thresholds
 
@@ -379,8 +384,7 @@ class CnvArguments():
 
     @property
     def cn_ps1_args_file(self):
-        filepath = utils.find_file(
-            self._lib_dir,
+        filepath = self._manifest.find_file(
             '*apt-genotype-axiom.AxiomCN_PS1.apt2.xml',
             missing_ok=True,
         )
@@ -392,40 +396,39 @@ class CnvArguments():
 
     @property
     def cn_gt1_args_file(self):
-        return utils.find_file(self._lib_dir,
-                               '*apt-genotype-axiom.AxiomCN_GT1.apt2.xml')
+        return self._manifest.find_file(
+            '*apt-genotype-axiom.AxiomCN_GT1.apt2.xml')
 
     @property
     def cnvmix_args_file(self):
-        return utils.find_file(
-            self._lib_dir,
+        return self._manifest.find_file(
             '*apt-copynumber-axiom-cnvmix.AxiomCNVmix.apt2.xml')
 
     @property
     def cnvhmm_args_file(self):
-        return utils.find_file(self._lib_dir,
-                               '*apt-copynumber-axiom-hmm.AxiomHMM.apt2.xml')
+        return self._manifest.find_file(
+            '*apt-copynumber-axiom-hmm.AxiomHMM.apt2.xml')
 
     @property
     def cnref_args_file(self):
-        return utils.find_file(
-            self._lib_dir, r'*.apt-copynumber-axiom-ref.AxiomCNref.apt2.xml')
+        return self._manifest.find_file(
+            r'*.apt-copynumber-axiom-ref.AxiomCNref.apt2.xml')
 
     @property
     def cnref_file(self):
-        return utils.find_file(self._lib_dir, r'*.cn_models')
+        return self._manifest.find_file(r'*.cn_models')
 
     @property
     def annotdb_file(self):
-        return utils.find_file(self._lib_dir, r'*.annot.db')
+        return self._manifest.find_file(r'*.annot.db')
 
     @property
     def special_snps_file(self):
-        return utils.find_file(self._lib_dir, r'*.specialSNPs')
+        return self._manifest.find_file(r'*.specialSNPs')
 
     @property
     def cn_models_template_file(self):
-        return utils.find_file(self._lib_dir, r'*.cn_models_template')
+        return self._manifest.find_file(r'*.cn_models_template')
 
     @property
     def mapd_threshold(self):
@@ -440,6 +443,7 @@ class TranslationArguments():
 
     def __init__(self, lib_dir):
         self._lib_dir = lib_dir
+        self._manifest = get_manifest(lib_dir)
         self._args = dict()
 
     @property
@@ -451,7 +455,7 @@ class TranslationArguments():
         if Key.TRANSLATION_FILE in self._args:
             return self._args[Key.TRANSLATION_FILE]
 
-        return utils.find_file(self._lib_dir, '*.translation')
+        return self._manifest.find_file('*.translation')
 
     @translation_file.setter
     def translation_file(self, filepath: Path):
@@ -462,7 +466,7 @@ class TranslationArguments():
         if Key.METABOLIZER_FILE in self._args:
             return self._args[Key.METABOLIZER_FILE]
 
-        return utils.find_file(self._lib_dir, '*.metabolizer')
+        return self._manifest.find_file('*.metabolizer')
 
     @metabolizer_file.setter
     def metabolizer_file(self, filepath: Path):
@@ -470,7 +474,7 @@ class TranslationArguments():
 
     @property
     def dc_annot_file(self):
-        return utils.find_file(self._lib_dir, '*.dc_annot.csv')
+        return self._manifest.find_file('*.dc_annot.csv')
 
     @property
     def allele_translation(self):
@@ -494,6 +498,7 @@ class FormatArguments():
         export_axas: bool = False,
     ):
         self._lib_dir = lib_dir
+        self._manifest = get_manifest(lib_dir)
         self._export_vcf = export_vcf
         self._export_plink = export_plink
         self._export_igv = export_igv
@@ -501,11 +506,11 @@ class FormatArguments():
 
     @property
     def annotdb_file(self):
-        return utils.find_file(self._lib_dir, '*annot.db')
+        return self._manifest.find_file('*annot.db')
 
     @property
     def ax_thresholds_dir(self):
-        return utils.find_file(self._lib_dir, '*annot.db')
+        return self._manifest.find_file('*annot.db')
 
     @property
     def export_igv(self):
@@ -524,14 +529,11 @@ class FormatArguments():
         return self._export_plink
 
 
-def _get_arg(arg_dom, name, analysis, converter=str, missing_ok=False):
-    for element in arg_dom.getElementsByTagName('Parameter'):
-        current_name = element.getAttribute('name')
-        current_analysis = element.getAttribute('analysis')
-        value = element.getAttribute('currentValue')
+def _get_arg(args, name, analysis, converter=str, missing_ok=False):
+    value = args.get((analysis, name))
 
-        if current_name == name and current_analysis == analysis:
-            return converter(value)
+    if value is not None:
+        return converter(value)
 
     if missing_ok:
         return None
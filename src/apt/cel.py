@@ -0,0 +1,391 @@
+import logging
+import re
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from . import utils
+
+CALVIN_MAGIC = 59
+XDA_MAGIC = 64
+
+DAT_HEADER_ARRAY_TYPE = re.compile(r'(\S+)\.1sq')
+DAT_HEADER_SCAN_DATE = re.compile(r'(\d\d/\d\d/\d\d \d\d:\d\d:\d\d)')
+
+_CEL_HEADERS = dict()
+
+
+def read_cel_header(cel_path: Path):
+    cel_path = Path(cel_path)
+
+    with cel_path.open('rb') as fh:
+        magic = fh.read(1)
+        fh.seek(0)
+
+        if not magic:
+            raise Exception(f'{cel_path} is empty')
+
+        if magic[0] == CALVIN_MAGIC:
+            header = _read_calvin_header(fh)
+        elif magic[0] == XDA_MAGIC:
+            header = _read_xda_header(fh)
+        elif fh.read(5) == b'[CEL]':
+            fh.seek(0)
+            header = _read_text_header(fh)
+        else:
+            raise Exception(f'{cel_path} is not a CEL file')
+
+    header['cel_path'] = cel_path
+    header['cel_name'] = cel_path.name
+
+    return header
+
+
+def scan_cel_headers(cel_paths: list, n_jobs: int = 8, cache_file=None):
+    import pandas as pd
+
+    cel_paths = [Path(x) for x in cel_paths]
+
+    if cache_file and cache_file.exists():
+        for cel_path, cached in utils.load(cache_file).items():
+            _CEL_HEADERS.setdefault(cel_path, cached)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        headers = list(executor.map(_read_cel_header_cached, cel_paths))
+
+    if cache_file:
+        utils.save(
+            {x: _CEL_HEADERS[x]
+             for x in cel_paths if x in _CEL_HEADERS},
+            cache_file,
+        )
+
+    return pd.DataFrame.from_records([{
+        k: v
+        for k, v in x.items() if k != 'params'
+    } for x in headers])
+
+
+def validate_cel(cel_path: Path, array_name: str = None):
+    cel_path = Path(cel_path)
+
+    try:
+        file_size = cel_path.stat().st_size
+        header = read_cel_header(cel_path)
+
+        rows = header['rows']
+        cols = header['cols']
+
+        if not rows or not cols or rows <= 0 or cols <= 0:
+            return f'invalid dimensions {rows} x {cols}'
+
+        if header['format'] == 'calvin':
+            error = _validate_calvin(cel_path, header, file_size)
+        elif header['format'] == 'xda':
+            error = _validate_xda(header, file_size)
+        else:
+            error = None
+    except Exception as e:
+        return str(e)
+
+    if error:
+        return error
+
+    array_type = header['array_type'] or ''
+
+    if array_name and array_type.lower() != array_name.lower():
+        return f'array type {header["array_type"]} != {array_name}'
+
+    return None
+
+
+def validate_cels(cel_paths: list, array_name: str = None, n_jobs: int = 8):
+    import pandas as pd
+
+    cel_paths = [Path(x) for x in cel_paths]
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        errors = list(
+            executor.map(lambda x: validate_cel(x, array_name), cel_paths))
+
+    return pd.DataFrame({
+        'cel_path': cel_paths,
+        'cel_name': [x.name for x in cel_paths],
+        'error': errors,
+    })
+
+
+def _validate_calvin(cel_path, header, file_size):
+    n_cells = header['rows'] * header['cols']
+
+    with cel_path.open('rb') as fh:
+        data_group_pos = header['data_group_pos']
+        n_intensities = None
+
+        for _ in range(header['n_data_groups']):
+            if data_group_pos >= file_size:
+                return f'data group at {data_group_pos} beyond end of file'
+
+            fh.seek(data_group_pos)
+            next_data_group_pos, data_set_pos, n_data_sets = struct.unpack(
+                '>IIi', _read_exactly(fh, 12))
+            _read_wstring(fh)
+
+            for _ in range(n_data_sets):
+                if data_set_pos >= file_size:
+                    return f'data set at {data_set_pos} beyond end of file'
+
+                fh.seek(data_set_pos)
+                name, data_end, n_rows = _read_data_set_header(fh)
+
+                if data_end > file_size:
+                    return (f'data set {name} ends at {data_end}, '
+                            f'file size is {file_size}')
+
+                if name == 'Intensity':
+                    n_intensities = n_rows
+
+                data_set_pos = _read_data_set_next_pos(fh, data_set_pos)
+
+            data_group_pos = next_data_group_pos
+
+    if n_intensities is None:
+        return 'no Intensity data set'
+
+    if n_intensities != n_cells:
+        return f'{n_intensities} intensities, expected {n_cells}'
+
+    return None
+
+
+def _read_data_set_header(fh):
+    first_element_pos, _ = struct.unpack('>II', _read_exactly(fh, 8))
+    name = _read_wstring(fh)
+
+    for _ in _read_params(fh):
+        pass
+
+    n_columns = _read_int(fh, '>I')
+    row_size = 0
+    for _ in range(n_columns):
+        _read_wstring(fh)
+        _read_exactly(fh, 1)    # column type
+        row_size += _read_int(fh)
+
+    n_rows = _read_int(fh, '>I')
+
+    return name, first_element_pos + n_rows * row_size, n_rows
+
+
+def _read_data_set_next_pos(fh, data_set_pos):
+    fh.seek(data_set_pos + 4)
+    return _read_int(fh, '>I')
+
+
+def _validate_xda(header, file_size):
+    if header['n_cells'] != header['rows'] * header['cols']:
+        return (f'{header["n_cells"]} cells, expected '
+                f'{header["rows"]} x {header["cols"]}')
+
+    expected_size = (header['data_pos'] + header['n_cells'] * 10 +
+                     header['n_masks'] * 4 + header['n_outliers'] * 4 +
+                     header['n_subgrids'] * 56)
+
+    if file_size < expected_size:
+        return f'file size {file_size} < expected {expected_size}'
+
+    return None
+
+
+def _read_cel_header_cached(cel_path: Path):
+    try:
+        current_fingerprint = utils.fingerprint(cel_path)
+    except OSError as e:
+        logging.warning(f'{cel_path}: {e}')
+        return _failed_header(cel_path, str(e))
+
+    cached = _CEL_HEADERS.get(cel_path)
+    if cached and cached['fingerprint'] == current_fingerprint:
+        return cached['header']
+
+    try:
+        header = read_cel_header(cel_path)
+    except Exception as e:
+        logging.warning(f'{cel_path}: {e}')
+        return _failed_header(cel_path, str(e))
+
+    header['error'] = None
+
+    _CEL_HEADERS[cel_path] = {
+        'fingerprint': current_fingerprint,
+        'header': header,
+    }
+
+    return header
+
+
+def _failed_header(cel_path, message):
+    return {
+        'cel_path': cel_path,
+        'cel_name': cel_path.name,
+        'format': None,
+        'array_type': None,
+        'barcode': None,
+        'sbarcode': None,
+        'scan_date': None,
+        'rows': None,
+        'cols': None,
+        'error': message,
+    }
+
+
+def _read_calvin_header(fh):
+    _, version, n_data_groups, data_group_pos = struct.unpack(
+        '>BBiI', _read_exactly(fh, 10))
+
+    params = dict()
+    _read_generic_data_header(fh, params)
+
+    return {
+        'format': 'calvin',
+        'array_type': params.get('affymetrix-array-type'),
+        'barcode': params.get('affymetrix-array-barcode'),
+        'sbarcode': params.get('affymetrix-plate-barcode'),
+        'scan_date': params.get('affymetrix-scan-date'),
+        'rows': params.get('affymetrix-cel-rows'),
+        'cols': params.get('affymetrix-cel-cols'),
+        'n_data_groups': n_data_groups,
+        'data_group_pos': data_group_pos,
+        'params': params,
+    }
+
+
+def _read_generic_data_header(fh, params):
+    _read_string(fh)    # data type identifier
+    _read_string(fh)    # file identifier
+    _read_wstring(fh)    # creation time
+    _read_wstring(fh)    # locale
+
+    for name, value in _read_params(fh):
+        params.setdefault(name, value)
+
+    n_parents = _read_int(fh)
+    for _ in range(n_parents):
+        _read_generic_data_header(fh, params)
+
+
+def _read_params(fh):
+    n_params = _read_int(fh)
+    for _ in range(n_params):
+        name = _read_wstring(fh)
+        value = _read_exactly(fh, _read_int(fh))
+        mime_type = _read_wstring(fh)
+        yield name, _decode_value(value, mime_type)
+
+
+def _decode_value(value, mime_type):
+    if mime_type == 'text/plain':
+        return value.decode('utf-16-be').rstrip('\x00')
+    if mime_type == 'text/ascii':
+        return value.decode('ascii').rstrip('\x00')
+    if mime_type == 'text/x-calvin-integer-32':
+        return struct.unpack('>i', value[0:4])[0]
+    if mime_type == 'text/x-calvin-unsigned-integer-32':
+        return struct.unpack('>I', value[0:4])[0]
+    if mime_type == 'text/x-calvin-integer-16':
+        return struct.unpack('>h', value[0:2])[0]
+    if mime_type == 'text/x-calvin-unsigned-integer-16':
+        return struct.unpack('>H', value[0:2])[0]
+    if mime_type == 'text/x-calvin-integer-8':
+        return struct.unpack('>b', value[0:1])[0]
+    if mime_type == 'text/x-calvin-unsigned-integer-8':
+        return struct.unpack('>B', value[0:1])[0]
+    if mime_type == 'text/x-calvin-float':
+        return struct.unpack('>f', value[0:4])[0]
+    return value
+
+
+def _read_xda_header(fh):
+    magic, version, rows, cols, n_cells = struct.unpack(
+        '<iiiii', _read_exactly(fh, 20))
+
+    header_str = _read_exactly(fh, _read_int(fh, '<i')).decode('latin-1')
+    algorithm = _read_exactly(fh, _read_int(fh, '<i')).decode('latin-1')
+    # algorithm parameters; not used
+    _read_exactly(fh, _read_int(fh, '<i'))
+    cell_margin, n_outliers, n_masks, n_subgrids = struct.unpack(
+        '<iIIi', _read_exactly(fh, 16))
+
+    header = _parse_dat_header(header_str)
+    header.update({
+        'format': 'xda',
+        'rows': rows,
+        'cols': cols,
+        'n_cells': n_cells,
+        'algorithm': algorithm,
+        'n_outliers': n_outliers,
+        'n_masks': n_masks,
+        'n_subgrids': n_subgrids,
+        'data_pos': fh.tell(),
+    })
+
+    return header
+
+
+def _read_text_header(fh):
+    lines = []
+    for line in fh:
+        line = line.decode('latin-1').strip()
+        if line == '[INTENSITY]':
+            break
+        lines.append(line)
+
+    header_str = '\n'.join(lines)
+
+    header = _parse_dat_header(header_str)
+    header['format'] = 'text'
+
+    return header
+
+
+def _parse_dat_header(header_str):
+    entries = dict()
+    for line in header_str.splitlines():
+        if '=' in line:
+            k, v = line.split('=', 1)
+            entries.setdefault(k.strip(), v.strip())
+
+    dat_header = entries.get('DatHeader', '')
+    array_type = DAT_HEADER_ARRAY_TYPE.search(dat_header)
+    scan_date = DAT_HEADER_SCAN_DATE.search(dat_header)
+
+    return {
+        'array_type': array_type.group(1) if array_type else None,
+        'barcode': None,
+        'sbarcode': None,
+        'scan_date': scan_date.group(1) if scan_date else None,
+        'rows': int(entries['Rows']) if 'Rows' in entries else None,
+        'cols': int(entries['Cols']) if 'Cols' in entries else None,
+        'params': entries,
+    }
+
+
+def _read_exactly(fh, n):
+    if n < 0:
+        raise Exception(f'invalid length {n} at offset {fh.tell()}')
+    data = fh.read(n)
+    if len(data) != n:
+        raise Exception(f'unexpected end of file at offset {fh.tell()}')
+    return data
+
+
+def _read_int(fh, fmt='>i'):
+    return struct.unpack(fmt, _read_exactly(fh, 4))[0]
+
+
+def _read_string(fh):
+    return _read_exactly(fh, _read_int(fh)).decode('ascii')
+
+
+def _read_wstring(fh):
+    return _read_exactly(fh, _read_int(fh) * 2).decode('utf-16-be')
@@ -0,0 +1,121 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from . import config, utils
+
+
+class ClusterSpace():
+
+    def __init__(self, summary_file: Path, meta: dict):
+        self._meta = meta
+        self._probeset2idx = {
+            x: i
+            for i, x in enumerate(meta['probeset_ids'])
+        }
+
+        shape = (len(meta['probeset_ids']), len(meta['samples']))
+
+        self._contrast = _open_block(
+            _cache_file(summary_file, config.CONTRAST_SUFFIX), shape)
+        self._strength = _open_block(
+            _cache_file(summary_file, config.STRENGTH_SUFFIX), shape)
+
+    @property
+    def probeset_ids(self):
+        return self._meta['probeset_ids']
+
+    @property
+    def samples(self):
+        return self._meta['samples']
+
+    @property
+    def contrast(self):
+        return self._contrast
+
+    @property
+    def strength(self):
+        return self._strength
+
+    def row(self, probeset_id):
+        idx = self._probeset2idx[probeset_id]
+        return self._contrast[idx], self._strength[idx]
+
+
+def _open_block(filepath: Path, shape: tuple):
+    # np.memmap cannot map an empty file
+    if 0 in shape:
+        return np.empty(shape, dtype=np.float32)
+    return np.memmap(filepath, dtype=np.float32, mode='r', shape=shape)
+
+
+def load_cluster_space(summary_file: Path):
+    meta_file = _cache_file(summary_file, config.CLUSTER_SPACE_SUFFIX)
+
+    if meta_file.exists():
+        meta = utils.load(meta_file)
+        if meta['fingerprint'] == utils.fingerprint(summary_file):
+            return ClusterSpace(summary_file, meta)
+        logging.info(f'{summary_file} changed; rebuilding cluster space')
+
+    return build_cluster_space(summary_file)
+
+
+def build_cluster_space(summary_file: Path, block_size: int = 10000):
+
+    current_fingerprint = utils.fingerprint(summary_file)
+    samples = utils.read_sample_columns(summary_file)
+
+    contrast_file = _cache_file(summary_file, config.CONTRAST_SUFFIX)
+    strength_file = _cache_file(summary_file, config.STRENGTH_SUFFIX)
+    meta_file = _cache_file(summary_file, config.CLUSTER_SPACE_SUFFIX)
+
+    meta_file.unlink(missing_ok=True)
+
+    probeset_ids = []
+    block_a = []
+    block_b = []
+
+    with contrast_file.open('wb') as contrast_fh, \
+            strength_file.open('wb') as strength_fh:
+        for record in utils.summaries_iter(summary_file):
+            signals = record['signals']
+            if 'A' not in signals or 'B' not in signals:
+                continue
+
+            probeset_ids.append(record['probeset_id'])
+            block_a.append(signals['A'].split('\t'))
+            block_b.append(signals['B'].split('\t'))
+
+            if len(block_a) >= block_size:
+                _write_block(block_a, block_b, contrast_fh, strength_fh)
+                block_a = []
+                block_b = []
+
+        _write_block(block_a, block_b, contrast_fh, strength_fh)
+
+    meta = {
+        'fingerprint': current_fingerprint,
+        'probeset_ids': probeset_ids,
+        'samples': samples,
+    }
+
+    utils.save(meta, meta_file)
+
+    return ClusterSpace(summary_file, meta)
+
+
+def _write_block(block_a, block_b, contrast_fh, strength_fh):
+    if not block_a:
+        return
+
+    a = np.log2(np.array(block_a, dtype=np.float64))
+    b = np.log2(np.array(block_b, dtype=np.float64))
+
+    contrast_fh.write((a - b).astype(np.float32).tobytes())
+    strength_fh.write(((a + b) / 2).astype(np.float32).tobytes())
+
+
+def _cache_file(summary_file: Path, suffix: str):
+    return summary_file.with_name(summary_file.name + suffix)
@@ -0,0 +1,74 @@
+import gzip
+import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+
+# compressions in flight, by resolved path; readers wait on these before
+# deciding between a file and its .gz
+_PENDING = dict()
+_PENDING_LOCK = threading.Lock()
+
+
+def wait_for(filepath: Path):
+    if not _PENDING:
+        return
+    with _PENDING_LOCK:
+        future = _PENDING.get(Path(filepath).resolve())
+    if future is not None:
+        future.result()
+
+
+class Compressor():
+
+    def __init__(self, n_jobs: int = 2, level: int = 6):
+        self._level = level
+        self._futures = dict()
+        self._executor = ThreadPoolExecutor(max_workers=n_jobs)
+
+    def submit(self, filepaths: list):
+        for filepath in filepaths:
+            filepath = Path(filepath)
+            if not filepath.exists():
+                continue
+            key = filepath.resolve()
+            with _PENDING_LOCK:
+                if key in _PENDING:
+                    continue
+                future = self._executor.submit(self._compress, filepath, key)
+                _PENDING[key] = future
+                self._futures[key] = future
+
+    def wait(self):
+        with _PENDING_LOCK:
+            futures = list(self._futures.values())
+        for future in futures:
+            future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _compress(self, filepath: Path, key: Path):
+        gz_file = filepath.with_name(f'{filepath.name}.gz')
+        tmp_file = filepath.with_name(f'.{gz_file.name}.tmp')
+
+        try:
+            with filepath.open('rb') as ifh, gzip.open(
+                    tmp_file, 'wb', compresslevel=self._level) as ofh:
+                shutil.copyfileobj(ifh, ofh, 1 << 20)
+            tmp_file.replace(gz_file)
+            filepath.unlink()
+        except Exception as e:
+            logging.warning(f'cannot compress {filepath}: {e}')
+            tmp_file.unlink(missing_ok=True)
+            return filepath
+        finally:
+            with _PENDING_LOCK:
+                _PENDING.pop(key, None)
+                self._futures.pop(key, None)
+
+        logging.debug(f'compressed {filepath}')
+
+        return gz_file
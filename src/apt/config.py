@@ -1,10 +1,16 @@
+import os
 import re
 from importlib import resources
+from pathlib import Path
 
 BIN_DIRS = [
     '/opt/apt/bin',
 ]
 
+CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME',
+                                Path.home() / '.cache')) / 'apt'
+APT_CMDS_CACHE_FILE = CACHE_DIR / 'apt_cmds.json'
+
 APT_PROGRAMS = [
     'apt-package-util',
     'apt-dmet-translation',
@@ -26,9 +32,15 @@ BANNER_WIDTH = 50
 RARE_HET_REPORT_FILENAME = 'AxiomGT1.rare_het.report.txt'
 FLOATING_POINT_PRECISION = 5
 CN_REGION_CALLS_FILENAME = 'AxiomCNVMix.cnregioncalls.txt'
+CN_REGION_CALLS_SAMPLE_COLUMN = 'cel_files'
 ALLELE_TRANSLATION_DIRNAME = 'allele_translation'
 AXAS_DIRNAME = 'axas'
 GENO_QC_FILENAME = 'apt-geno-qc.txt'
+DQC_CACHE_FILENAME = 'dqc_cache.pkl.gz'
+CEL_CHECK_REPORT_FILENAME = 'cel_check.tsv'
+CEL_HEADERS_FILENAME = 'cel_headers.pkl.gz'
+SUMMARY_STORE_FILENAME = 'summary_store.pkl.gz'
+ASSEMBLY_FILENAME = 'assembly.pkl.gz'
 CALLS_FILENAME = 'AxiomGT1.calls.txt'
 REPORT_FILENAME = 'AxiomGT1.report.txt'
 PS_PERFORMANCE_FILENAME = 'Ps.performance.txt'
@@ -40,10 +52,15 @@ METRICS_FILENAME = 'metrics.txt'
 MULTI_METRICS_FILENAME = 'multi-metrics.txt'
 CONFIDENCES_FILENAME = 'AxiomGT1.confidences.txt'
 TRUSTCHECK_FILENAME = 'AxiomGT1.trustcheck.txt'
+BLEMISHES_PATTERN = '*blemish*.txt'
 RECOMMENDED_FILENAME = 'Recommended.ps'
 CNPSCALLS_FILENAME = 'AxiomCNVMix.cnpscalls.txt'
 HMM_CNV_FILENAME = 'AxiomHMM.cnv.a5'
 
+CLUSTER_SPACE_SUFFIX = '.cluster_space'
+CONTRAST_SUFFIX = '.contrast.f32'
+STRENGTH_SUFFIX = '.strength.f32'
+
 PLATEMAP_FILENAME = 'platemap.tsv'
 GENDER_FILENAME = 'gender.tsv'
 SAMPLE_ORDER_FILENAME = 'sample_order.tsv'
@@ -128,6 +145,8 @@ CNREF_FILENAME = 'self.cn_models'
 CNV_REPORT_FILENAME = 'cnv.tsv'
 LOH_REPORT_FILENAME = 'loh.tsv'
 TMP_DIRNAME = 'tmp'
+STAGING_DIRNAME = 'staging'
+STAGING_MAX_BYTES = 200 * 1024**3
 CNVHMM_A5_FILENAME = 'AxiomHMM.cnv.a5'
 VCF_DIRNAME = 'vcf'
 AXAS_DIRNAME = 'axas'
@@ -136,6 +155,7 @@ IGV_DIRNAME = 'igv'
 SNV_DIRNAME = 'snv'
 SAMPLE_QC_DIRNAME = 'qc'
 TRANSLATION_DIRNAME = 'tx'
+TRANSLATION_SHARDS_FILENAME = 'shards.tsv'
 PLINK_DIRNAME = 'plink'
 REPORT_DIRNAME = 'report'
 
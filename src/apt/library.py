@@ -1,3 +1,4 @@
+import fnmatch
 import gzip
 import json
 import logging
@@ -6,16 +7,16 @@ import pickle
 import re
 import shutil
 import sys
-import xml.dom.minidom
 from datetime import datetime
 from enum import Enum
 from importlib import resources
 from pathlib import Path
 from subprocess import PIPE, STDOUT, Popen
 
-import pandas as pd
-
 from . import config, utils
+from .args_file import process_multi_alleles, read_args_file
+
+_MANIFESTS = dict()
 
 
 class Library():
@@ -26,6 +27,7 @@ class Library():
     ):
 
         self.path = Path(libpath)
+        self._manifest = get_manifest(self.path)
         ax_package_file = self.get_filepath('*.ax_package')
 
         with ax_package_file.open('r') as fh:
@@ -135,7 +137,7 @@ class Library():
 
     def get_filepath(self, pattern, missing_ok=False):
         root_path = self.path
-        filepaths = [x for x in root_path.glob(pattern)]
+        filepaths = self._manifest.find_files(pattern)
 
         if len(filepaths) == 0:
             if missing_ok:
@@ -153,10 +155,75 @@ class Library():
         return filepath
 
 
+class LibraryManifest():
+
+    def __init__(self, lib_dir: Path):
+        self._path = Path(lib_dir).resolve()
+        self._mtime_ns = self._path.stat().st_mtime_ns
+        self._filenames = sorted(x.name for x in os.scandir(self._path))
+        self._filename_set = set(self._filenames)
+        self._found = dict()
+
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def is_stale(self):
+        return self._path.stat().st_mtime_ns != self._mtime_ns
+
+    def find_files(self, pattern):
+        if pattern in self._found:
+            return self._found[pattern]
+
+        if any(x in pattern for x in '*?['):
+            filenames = fnmatch.filter(self._filenames, pattern)
+        elif pattern in self._filename_set:
+            filenames = [pattern]
+        else:
+            filenames = []
+
+        filepaths = [(self._path / x).resolve() for x in filenames]
+        self._found[pattern] = filepaths
+
+        return filepaths
+
+    def find_file(self, pattern, missing_ok=False):
+        filepaths = self.find_files(pattern)
+
+        if len(filepaths) == 0:
+            if missing_ok:
+                return None
+            raise Exception(
+                f'{self._path} does not contain file with pattern {pattern}')
+
+        filepath = filepaths[0]
+
+        if len(filepaths) > 1:
+            logging.warning(
+                f'{self._path} contains more than one file with pattern {pattern}. {filepath} is used'
+            )
+
+        return filepath
+
+
+def get_manifest(lib_dir: Path):
+    lib_dir = Path(lib_dir).resolve()
+
+    manifest = _MANIFESTS.get(lib_dir)
+
+    if manifest is None or manifest.is_stale:
+        manifest = LibraryManifest(lib_dir)
+        _MANIFESTS[lib_dir] = manifest
+
+    return manifest
+
+
 class Step1Args():
 
     def __init__(self, args_file):
         self.args_file = args_file
+        self.args = read_args_file(args_file)
 
         self.ps_file = args_file.parents[0] / self._arg(
             name='probeset-ids',
@@ -169,15 +236,11 @@ class Step1Args():
         )
 
     def _arg(self, name, analysis):
-        args_dom = xml.dom.minidom.parse(str(self.args_file))
+        value = self.args.get((analysis, name))
 
-        for element in args_dom.getElementsByTagName('Parameter'):
-            current_name = element.getAttribute('name')
-            current_analysis = element.getAttribute('analysis')
-            value = element.getAttribute('currentValue')
+        if value is not None:
+            return value
 
-            if current_name == name and current_analysis == analysis:
-                return value
         utils.error(''
                     f'{self.args_file} does not contain '
                     f'parameter with name = {name} and analysis = {analysis}'
@@ -190,7 +253,7 @@ class Step2Args():
 
         self.args_file = args_file
 
-        self.args_dom = xml.dom.minidom.parse(str(self.args_file))
+        self.args = read_args_file(args_file)
 
         dir_path = args_file.parents[0]
 
@@ -223,8 +286,7 @@ class Step2Args():
             analysis='genotyping-node',
         )
 
-        self.process_multi_alleles = self._process_multi_alleles(
-            self.args_dom)
+        self.process_multi_alleles = process_multi_alleles(self.args)
 
         if self.process_multi_alleles:
             self.multi_priors_input_file = dir_path / self._arg(
@@ -251,29 +313,5 @@ class Step2Args():
             'probeset-summarize-genotype-node',
         )
 
-    @staticmethod
-    def _process_multi_alleles(args_dom):
-        for element in args_dom.getElementsByTagName('Parameter'):
-            name = element.getAttribute('name')
-            value = element.getAttribute('currentValue')
-
-            if name != 'process-multi-alleles':
-                continue
-
-            if value == 'true':
-                return True
-
-        return False
-
     def _arg(self, name, analysis):
-        args_dom = self.args_dom
-
-        for element in args_dom.getElementsByTagName('Parameter'):
-            current_name = element.getAttribute('name')
-            current_analysis = element.getAttribute('analysis')
-            value = element.getAttribute('currentValue')
-
-            if current_name == name and current_analysis == analysis:
-                return value
-
-        return None
+        return self.args.get((analysis, name))
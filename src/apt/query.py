@@ -0,0 +1,177 @@
+from pathlib import Path
+
+import numpy as np
+
+from . import config, utils
+
+
+def query_cluster_data(
+    probeset_ids: list,
+    workspace_dirs: list,
+    index_dir: Path = None,
+):
+
+    probeset_ids = list(probeset_ids)
+
+    return [
+        _query_batch(probeset_ids, Path(x), index_dir)
+        for x in workspace_dirs
+    ]
+
+
+def _query_batch(probeset_ids: list, workspace_dir: Path, index_dir: Path):
+
+    snv_dir = _find_snv_dir(workspace_dir)
+
+    calls_index = utils.load_index(
+        snv_dir / config.CALLS_FILENAME,
+        index_dir,
+    )
+    samples = calls_index['columns']
+
+    calls = _read_matrix(
+        snv_dir / config.CALLS_FILENAME,
+        probeset_ids,
+        samples,
+        dtype=np.int8,
+        fill_value=-1,
+        index_dir=index_dir,
+    )
+    confidences = _read_matrix(
+        snv_dir / config.CONFIDENCES_FILENAME,
+        probeset_ids,
+        samples,
+        dtype=np.float32,
+        fill_value=np.nan,
+        index_dir=index_dir,
+    )
+    a_signals = _read_matrix(
+        snv_dir / config.SUMMARY_FILENAME,
+        [f'{x}-A' for x in probeset_ids],
+        samples,
+        dtype=np.float32,
+        fill_value=np.nan,
+        index_dir=index_dir,
+    )
+    b_signals = _read_matrix(
+        snv_dir / config.SUMMARY_FILENAME,
+        [f'{x}-B' for x in probeset_ids],
+        samples,
+        dtype=np.float32,
+        fill_value=np.nan,
+        index_dir=index_dir,
+    )
+    clusters, posteriors, cv = _read_posteriors(
+        snv_dir / config.POSTERIORS_FILENAME,
+        probeset_ids,
+        index_dir,
+    )
+
+    found = np.array([x in calls_index['offsets'] for x in probeset_ids])
+
+    return {
+        'workspace_dir': workspace_dir,
+        'probeset_ids': probeset_ids,
+        'samples': samples,
+        'found': found,
+        'a': a_signals,
+        'b': b_signals,
+        'calls': calls,
+        'confidences': confidences,
+        'clusters': clusters,
+        'posteriors': posteriors,
+        'cv': cv,
+    }
+
+
+def _find_snv_dir(workspace_dir: Path):
+    snv_dir = workspace_dir / config.SNV_DIRNAME
+
+    if (snv_dir / config.CALLS_FILENAME).exists():
+        return snv_dir
+
+    if (workspace_dir / config.CALLS_FILENAME).exists():
+        return workspace_dir
+
+    raise Exception(
+        f'{workspace_dir} does not contain {config.CALLS_FILENAME}')
+
+
+def _read_matrix(data_file, keys, samples, dtype, fill_value, index_dir):
+
+    index = utils.load_index(data_file, index_dir)
+
+    if index['columns'] == samples:
+        col_idx = None
+    else:
+        col2idx = {x: i for i, x in enumerate(index['columns'])}
+        col_idx = np.array([col2idx[x] for x in samples])
+
+    matrix = np.full((len(keys), len(samples)), fill_value, dtype=dtype)
+
+    with data_file.open('rb') as fh:
+        for i, key in enumerate(keys):
+            row = utils.read_indexed_row(fh, index, key)
+            if row is None:
+                continue
+            values = np.array(row, dtype=np.float64)
+            if col_idx is not None:
+                values = values[col_idx]
+            matrix[i] = values
+
+    return matrix
+
+
+def _read_posteriors(posteriors_file, probeset_ids, index_dir):
+
+    index = utils.load_index(posteriors_file, index_dir)
+
+    cv_idx = [i for i, x in enumerate(index['columns']) if x == 'CV']
+    cluster_idx = [i for i, x in enumerate(index['columns']) if x != 'CV']
+    clusters = [index['columns'][i] for i in cluster_idx]
+
+    rows = []
+    with posteriors_file.open('rb') as fh:
+        for probeset_id in probeset_ids:
+            row = utils.read_indexed_row(fh, index, probeset_id)
+            if row is None:
+                rows.append(None)
+                continue
+            rows.append((
+                np.array(
+                    [row[i].split(',') for i in cluster_idx],
+                    dtype=np.float64,
+                ),
+                np.array(
+                    [x for i in cv_idx for x in row[i].split(',')],
+                    dtype=np.float64,
+                ),
+            ))
+
+    found = [x for x in rows if x is not None]
+
+    if not found:
+        return (
+            clusters,
+            np.full((len(probeset_ids), len(clusters), 0),
+                    np.nan,
+                    dtype=np.float32),
+            np.full((len(probeset_ids), 0), np.nan, dtype=np.float32),
+        )
+
+    posteriors = np.full(
+        (len(probeset_ids), *found[0][0].shape),
+        np.nan,
+        dtype=np.float32,
+    )
+    cv = np.full(
+        (len(probeset_ids), *found[0][1].shape),
+        np.nan,
+        dtype=np.float32,
+    )
+
+    for i, row in enumerate(rows):
+        if row is not None:
+            posteriors[i], cv[i] = row
+
+    return clusters, posteriors, cv
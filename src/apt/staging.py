@@ -0,0 +1,197 @@
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from . import config, utils
+
+
+class Stager():
+
+    def __init__(
+        self,
+        scratch_dir: Path,
+        max_bytes: int = config.STAGING_MAX_BYTES,
+    ):
+        self._staging_dir = Path(
+            scratch_dir) / config.TMP_DIRNAME / config.STAGING_DIRNAME
+        self._max_bytes = max_bytes
+        self._n_bytes = 0
+        self._staged = OrderedDict()
+        self._pinned = Counter()
+        self._futures = dict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    @property
+    def staging_dir(self):
+        return self._staging_dir
+
+    @property
+    def n_bytes(self):
+        return self._n_bytes
+
+    def stage(self, filepath: Path):
+        src = Path(filepath).absolute()
+
+        with self._lock:
+            self._pinned[src] += 1
+            future = self._futures.get(src)
+            if future is None or not self._is_current(src):
+                future = Future()
+                self._futures[src] = future
+                owner = True
+            else:
+                owner = False
+                if src in self._staged:
+                    self._staged.move_to_end(src)
+
+        try:
+            if owner:
+                self._run(src, future)
+            return future.result()
+        except BaseException:
+            self.release([src])
+            raise
+
+    def stage_all(self, filepaths: list):
+        return [self.stage(x) for x in filepaths]
+
+    def prefetch(self, filepaths: list):
+        for filepath in filepaths:
+            if not filepath:
+                continue
+            src = Path(filepath).absolute()
+            with self._lock:
+                if src in self._futures and self._is_current(src):
+                    continue
+                future = Future()
+                self._futures[src] = future
+            self._executor.submit(self._run, src, future)
+
+    def release(self, filepaths: list):
+        with self._lock:
+            for filepath in filepaths:
+                src = Path(filepath).absolute()
+                self._pinned[src] -= 1
+                if self._pinned[src] <= 0:
+                    del self._pinned[src]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def _is_current(self, src):
+        entry = self._staged.get(src)
+        if entry is None:
+            return src in self._futures and not self._futures[src].done()
+        try:
+            return entry['fingerprint'] == utils.fingerprint(src)
+        except OSError:
+            return False
+
+    def _run(self, src, future):
+        try:
+            future.set_result(self._copy(src))
+        except Exception as e:
+            logging.warning(f'cannot stage {src}: {e}')
+            future.set_result(src)
+
+    def _copy(self, src):
+        # a symlinked CEL is staged under its own name, not its target's,
+        # so cel_files still match the samples
+        target = src.resolve()
+
+        current_fingerprint = utils.fingerprint(target)
+        size = current_fingerprint[0]
+
+        if size > self._max_bytes:
+            logging.info(f'{src} exceeds the staging budget; not staged')
+            return src
+
+        dir_key = hashlib.blake2b(
+            str(src.parent).encode(),
+            digest_size=8,
+        ).hexdigest()
+        dst = self._staging_dir / dir_key / src.name
+
+        with self._lock:
+            self._evict(size, src)
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_name(f'.{dst.name}.{threading.get_ident()}')
+
+        if target.stat().st_dev == dst.parent.stat().st_dev:
+            tmp.unlink(missing_ok=True)
+            os.link(target, tmp)
+        else:
+            shutil.copyfile(target, tmp)
+        tmp.replace(dst)
+
+        with self._lock:
+            previous = self._staged.pop(src, None)
+            if previous:
+                self._n_bytes -= previous['size']
+            self._staged[src] = {
+                'dst': dst,
+                'size': size,
+                'fingerprint': current_fingerprint,
+            }
+            self._n_bytes += size
+
+        logging.debug(f'staged {src} -> {dst}')
+
+        return dst
+
+    def _evict(self, size, keep):
+        for src in list(self._staged):
+            if self._n_bytes + size <= self._max_bytes:
+                break
+            if src in self._pinned or src == keep:
+                continue
+            entry = self._staged.pop(src)
+            self._futures.pop(src, None)
+            self._n_bytes -= entry['size']
+            entry['dst'].unlink(missing_ok=True)
+            logging.debug(f'evicted {entry["dst"]}')
+
+
+class StagingSession():
+
+    def __init__(self, stager: Stager = None):
+        self._stager = stager
+        self._filepaths = []
+
+    def stage(self, filepath: Path):
+        if not self._stager or not filepath:
+            return filepath
+        staged = self._stager.stage(filepath)
+        self._filepaths.append(filepath)
+        return staged
+
+    def stage_samples(self, samples):
+        if not self._stager:
+            return samples
+        return samples.assign(
+            cel_path=[str(self.stage(x)) for x in samples['cel_path']])
+
+    def stage_cels_file(self, cels_file: Path, output_file: Path):
+        if not self._stager:
+            return cels_file
+
+        with cels_file.open('rt') as ifh, output_file.open('wt') as ofh:
+            ofh.write(ifh.readline())
+            for line in ifh:
+                line = line.strip()
+                if line:
+                    ofh.write(f'{self.stage(line)}\n')
+
+        return output_file
+
+    def release(self):
+        if self._stager and self._filepaths:
+            self._stager.release(self._filepaths)
+        self._filepaths = []
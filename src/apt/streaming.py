@@ -0,0 +1,133 @@
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class CallRateAccumulator():
+
+    def __init__(self, block_size: int = 10000):
+        self._block_size = block_size
+        self._block = []
+        self._samples = None
+        self._n_calls = None
+        self._n_total = 0
+
+    def feed(self, line: str):
+        if line.startswith('#'):
+            return
+
+        if self._samples is None:
+            self._samples = line.rstrip('\r\n').split('\t')[1:]
+            self._n_calls = np.zeros(len(self._samples), dtype=np.int64)
+            return
+
+        self._block.append(line.rstrip('\r\n').split('\t')[1:])
+
+        if len(self._block) >= self._block_size:
+            self._flush()
+
+    def report(self):
+        import pandas as pd
+
+        self._flush()
+
+        if self._samples is None:
+            raise Exception('no calls header seen')
+
+        if self._n_total:
+            call_rates = self._n_calls / self._n_total * 100
+        else:
+            call_rates = np.full(len(self._samples), np.nan)
+
+        return pd.DataFrame({
+            'cel_name': self._samples,
+            'call_rate': call_rates,
+        })
+
+    def _flush(self):
+        if not self._block:
+            return
+        block = np.array(self._block)
+        self._n_calls += (block != '-1').sum(axis=0)
+        self._n_total += len(block)
+        self._block.clear()
+
+
+# Tailing only sees a file that is written front to back. A writer that
+# seeks back, truncates or rewrites the file leaves the lines already
+# yielded stale, just as a FIFO would break; execute_streaming reports
+# whether the tail still matches the final file so callers can fall back.
+def tail_lines(
+    filepath: Path,
+    done: threading.Event,
+    poll_interval: float = 0.2,
+):
+    fh = None
+    buffer = ''
+
+    try:
+        while True:
+            # sample the flag before reading: an empty read after the writer
+            # finished means everything has been seen
+            finished = done.is_set()
+
+            if fh is None:
+                if filepath.exists():
+                    fh = filepath.open('rt', newline='')
+                elif finished:
+                    return
+                else:
+                    time.sleep(poll_interval)
+                    continue
+
+            chunk = fh.read(1 << 20)
+
+            if chunk:
+                buffer += chunk
+                *lines, buffer = buffer.split('\n')
+                for line in lines:
+                    yield f'{line}\n'
+            elif finished:
+                break
+            else:
+                time.sleep(poll_interval)
+
+        if buffer:
+            yield buffer
+    finally:
+        if fh:
+            fh.close()
+
+
+def execute_streaming(cmd, filepath: Path, consumers: list):
+    filepath.unlink(missing_ok=True)
+
+    done = threading.Event()
+    errors = []
+
+    def run():
+        try:
+            cmd.execute()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            done.set()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+
+    n_bytes = 0
+    try:
+        for line in tail_lines(filepath, done):
+            n_bytes += len(line.encode())
+            for consumer in consumers:
+                consumer(line)
+    finally:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return filepath.exists() and filepath.stat().st_size == n_bytes
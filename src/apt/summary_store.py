@@ -0,0 +1,81 @@
+import logging
+from pathlib import Path
+
+from . import config, utils
+
+
+class SummaryStore():
+
+    def __init__(self, store_dir: Path):
+        self._store_dir = store_dir
+        self._manifest_file = store_dir / config.SUMMARY_STORE_FILENAME
+
+        self._store_dir.mkdir(parents=True, exist_ok=True)
+
+        if self._manifest_file.exists():
+            self._chunks = utils.load(self._manifest_file)
+        else:
+            self._chunks = []
+
+    @property
+    def store_dir(self):
+        return self._store_dir
+
+    @property
+    def chunks(self):
+        return list(self._chunks)
+
+    @property
+    def samples(self):
+        return [x for chunk in self._chunks for x in chunk['samples']]
+
+    def next_chunk_dir(self):
+        chunk_dir = self._store_dir / f'chunk_{len(self._chunks):04d}'
+        chunk_dir.mkdir(parents=True, exist_ok=True)
+        return chunk_dir
+
+    def add_chunk(self, summary_file: Path, trustcheck_file: Path = None):
+        samples = utils.read_sample_columns(summary_file)
+
+        duplicated = set(samples) & set(self.samples)
+        if duplicated:
+            raise Exception(f'{summary_file}: samples already in store: '
+                            f'{sorted(duplicated)[0:5]}')
+
+        if trustcheck_file and not trustcheck_file.exists():
+            trustcheck_file = None
+
+        self._chunks.append({
+            'summary_file': summary_file,
+            'trustcheck_file': trustcheck_file,
+            'samples': samples,
+        })
+
+        utils.save(self._chunks, self._manifest_file)
+
+        logging.info(f'summary store {self._store_dir}: added chunk of '
+                     f'{len(samples)} samples, {len(self.samples)} in total')
+
+    def combine(self, output_dir: Path):
+        if not self._chunks:
+            raise Exception(f'summary store {self._store_dir} is empty')
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        summary_file = output_dir / config.SUMMARY_FILENAME
+        trustcheck_file = output_dir / config.TRUSTCHECK_FILENAME
+
+        utils.paste_columns(
+            [x['summary_file'] for x in self._chunks],
+            summary_file,
+        )
+
+        trustcheck_files = [x['trustcheck_file'] for x in self._chunks]
+
+        if all(trustcheck_files):
+            utils.paste_columns(trustcheck_files, trustcheck_file)
+        else:
+            trustcheck_file = None
+
+        return summary_file, trustcheck_file
+
@@ -1,20 +1,23 @@
+import contextlib
 import gzip
+import hashlib
+import itertools
 import json
 import logging
+import operator
+import os
 import pickle
 import re
 import shutil
 import sys
 from pathlib import Path
 
-import humanfriendly
-import numpy as np
-import pandas as pd
-
-from . import config
+from . import compression, config
 
 PROBESET_ID_PTN = re.compile(r'^((?:AX|AFFX-SP|AFFX-NP)-\d+).*$')
 
+_INDEXES = dict()
+
 
 def find_apt_cmds(apt_cmds, bin_dirs):
 
@@ -38,11 +41,15 @@ def find_apt_cmds(apt_cmds, bin_dirs):
 
 
 def euclidean_distance(v1, v2):
+    import numpy as np
+
     return np.sqrt(np.dot(v1, v1) + np.dot(v2, v2))
 
 
 def cosine(v1, v2):
 
+    import numpy as np
+
     x = np.dot(v1, v2)
     y = np.sqrt(np.dot(v1, v1)) * np.sqrt(np.dot(v2, v2))
 
@@ -71,6 +78,64 @@ def export_probesets(probesets, filepath):
             fd.write(f'{x}\n')
 
 
+def resolve_compressed(filepath: Path):
+    compression.wait_for(filepath)
+
+    gz_file = filepath.with_name(f'{filepath.name}.gz')
+    if not filepath.exists() and gz_file.exists():
+        return gz_file
+    return filepath
+
+
+def open_text(filepath: Path):
+    filepath = resolve_compressed(filepath)
+    if filepath.suffix == '.gz':
+        return gzip.open(filepath, 'rt')
+    return filepath.open('rt')
+
+
+def ensure_uncompressed(filepath: Path):
+    compression.wait_for(filepath)
+
+    gz_file = filepath.with_name(f'{filepath.name}.gz')
+    if filepath.exists() or not gz_file.exists():
+        return filepath
+
+    tmp_file = filepath.with_name(f'.{filepath.name}.tmp')
+    with gzip.open(gz_file, 'rb') as ifh, tmp_file.open('wb') as ofh:
+        shutil.copyfileobj(ifh, ofh, 1 << 20)
+    tmp_file.replace(filepath)
+
+    return filepath
+
+
+def load_probesets(filepath):
+    with filepath.open('rt') as fd:
+        probesets = {x.strip() for x in fd}
+
+    probesets.discard('probeset_id')
+    probesets.discard('')
+
+    return probesets
+
+
+def load_ps2snp(filepath):
+    ps2snp = dict()
+    with filepath.open('rt') as fd:
+        for line in fd:
+            if line.startswith('#'):
+                continue
+            break
+
+        for line in fd:
+            items = line.strip().split('\t')
+            if len(items) < 2:
+                continue
+            ps2snp[items[0]] = items[1]
+
+    return ps2snp
+
+
 def random_sample(category, probesets, n, output_dir):
     random_ps_file = output_dir / f'{category}.{n}.ps'
 
@@ -140,6 +205,8 @@ def eval_sample_quality(
     min_samples_for_plate_qccr,
 ):
 
+    import pandas as pd
+
     qc_result_list = []
     qc_note_list = []
     idx_list = []
@@ -185,6 +252,8 @@ def eval_sample_quality(
 
 def call_rate_from_report_file(axiom_gt1_report_file):
 
+    import pandas as pd
+
     call_rates = pd.read_csv(
         axiom_gt1_report_file,
         comment='#',
@@ -196,8 +265,10 @@ def call_rate_from_report_file(axiom_gt1_report_file):
 
 
 def call_rate_from_calls_file(axiom_gt1_calls_file):
+    import pandas as pd
+
     calls = pd.read_csv(
-        axiom_gt1_calls_file,
+        resolve_compressed(Path(axiom_gt1_calls_file)),
         comment='#',
         header=0,
         sep='\t',
@@ -220,8 +291,12 @@ def call_rate_from_calls_file(axiom_gt1_calls_file):
 
 
 def find_files(root_dir_path, file_pattern, missing_ok=False):
+    from .library import get_manifest
 
-    filepaths = [x.resolve() for x in root_dir_path.glob(file_pattern)]
+    if '/' in file_pattern:
+        filepaths = [x.resolve() for x in root_dir_path.glob(file_pattern)]
+    else:
+        filepaths = get_manifest(root_dir_path).find_files(file_pattern)
 
     if len(filepaths) > 0:
         return filepaths
@@ -254,7 +329,7 @@ def find_file(root_dir_path, file_pattern, missing_ok=False):
     return found_file
 
 
-def export_cels(cels: pd.DataFrame, filepath):
+def export_cels(cels, filepath):
     cels.sort_values(by=['cel_order'])[['cel_path']].to_csv(
         filepath,
         header=['cel_files'],
@@ -297,8 +372,10 @@ def df2tsv(
 
 
 def tsv2df(filepath):
+    import pandas as pd
+
     return pd.read_csv(
-        filepath,
+        resolve_compressed(Path(filepath)),
         comment='#',
         header=0,
         sep='\t',
@@ -308,7 +385,9 @@ def tsv2df(filepath):
 
 def get_array_name(lib_dir: Path):
 
-    ax_package_file = find_file(lib_dir, '*.ax_package')
+    from .library import get_manifest
+
+    ax_package_file = get_manifest(lib_dir).find_file('*.ax_package')
 
     with ax_package_file.open('r') as fh:
         ax_package = json.load(fh)
@@ -335,6 +414,8 @@ def log_start(
 
 
 def log_stop(analysis_type, start_time, stop_time):
+    import humanfriendly
+
     logging.info('')
     banner = f'axbp {analysis_type} finished'
     logging.info('#' * config.BANNER_WIDTH)
@@ -348,7 +429,7 @@ def log_stop(analysis_type, start_time, stop_time):
 
 def cscores_iter(filepath):
     col2idx = {}
-    with filepath.open('rt') as fh:
+    with open_text(filepath) as fh:
         for line in fh:
             if line.startswith('#'):
                 continue
@@ -369,7 +450,7 @@ def cscores_iter(filepath):
 
 def posteriors_iter(filepath):
     col2idx = {}
-    with filepath.open('rt') as fh:
+    with open_text(filepath) as fh:
         for line in fh:
             if line.startswith('#'):
                 continue
@@ -413,7 +494,7 @@ def posteriors_iter(filepath):
 
 def summaries_iter(filepath):
     col2idx = {}
-    with filepath.open('rt') as fh:
+    with open_text(filepath) as fh:
         for line in fh:
             if line.startswith('#'):
                 continue
@@ -458,13 +539,24 @@ def summaries_iter(filepath):
 
 def subset_file(input_file: Path, output_file: Path, probeset_ids: set):
 
-    with input_file.open('rt') as ifh, output_file.open('wt') as ofh:
+    return split_file(input_file, [output_file],
+                      dict.fromkeys(probeset_ids, 0))
+
+
+def split_file(input_file: Path, output_files: list, probeset_shards: dict):
+    # rows go to output_files[probeset_shards[probeset_id]]; rows of other
+    # probesets are dropped. returns the probesets written, in file order
+    written = []
+
+    with contextlib.ExitStack() as stack:
+        ifh = stack.enter_context(open_text(input_file))
+        ofhs = [stack.enter_context(x.open('wt')) for x in output_files]
+
         for line in ifh:
-            if line.startswith('#'):
+            for ofh in ofhs:
                 ofh.write(line)
-                continue
-            ofh.write(line)    # write header
-            break
+            if not line.startswith('#'):
+                break    # header written
 
         for line in ifh:
             id_ = line.split('\t', 1)[0]
@@ -475,10 +567,191 @@ def subset_file(input_file: Path, output_file: Path, probeset_ids: set):
                 raise Exception(line[0:78])
 
             probeset_id = match.group(1)
-            if probeset_id in probeset_ids:
+            shard = probeset_shards.get(probeset_id)
+            if shard is not None:
+                ofhs[shard].write(line)
+                if not written or written[-1] != probeset_id:
+                    written.append(probeset_id)
+
+    return written
+
+
+def read_sample_columns(filepath: Path):
+    with open_text(filepath) as fh:
+        for line in fh:
+            if line.startswith('#'):
+                continue
+            return line.rstrip('\r\n').split('\t')[1:]
+
+    raise Exception(f'{filepath}: no header')
+
+
+def paste_columns(input_files: list, output_file: Path):
+
+    ifhs = [open_text(x) for x in input_files]
+
+    try:
+        with output_file.open('wt') as ofh:
+            headers = []
+            for ifh in ifhs:
+                line = ifh.readline()
+                while line.startswith('#'):
+                    if ifh is ifhs[0]:
+                        ofh.write(line)
+                    line = ifh.readline()
+                headers.append(line.rstrip('\r\n').split('\t', 1))
+
+            columns = '\t'.join(x for _, x in headers)
+            ofh.write(f'{headers[0][0]}\t{columns}\n')
+
+            for lines in itertools.zip_longest(*ifhs):
+                if None in lines:
+                    raise Exception(f'{input_files[lines.index(None)]}: '
+                                    'row count differs')
+
+                rows = [x.rstrip('\r\n').split('\t', 1) for x in lines]
+                key = rows[0][0]
+
+                for row, input_file in zip(rows, input_files):
+                    if row[0] != key:
+                        raise Exception(f'{input_file}: expected {key}, '
+                                        f'found {row[0]}')
+
+                values = '\t'.join(x for _, x in rows)
+                ofh.write(f'{key}\t{values}\n')
+    finally:
+        for ifh in ifhs:
+            ifh.close()
+
+
+def drop_sample_columns(input_file: Path, output_file: Path, samples: set):
+
+    with open_text(input_file) as ifh, output_file.open('wt') as ofh:
+        line = ifh.readline()
+        while line.startswith('#'):
+            ofh.write(line)
+            line = ifh.readline()
+
+        columns = line.rstrip('\r\n').split('\t')
+        mask = [0] + [
+            i for i, x in enumerate(columns) if i > 0 and x not in samples
+        ]
+
+        if len(mask) == 1:
+            raise Exception(f'{input_file}: no sample columns left')
+
+        n_dropped = len(columns) - len(mask)
+        if n_dropped != len(samples):
+            logging.warning(f'{input_file}: {len(samples) - n_dropped} '
+                            'samples to drop not found')
+
+        keep = operator.itemgetter(*mask)
+
+        ofh.write('\t'.join(keep(columns)))
+        ofh.write('\n')
+
+        for line in ifh:
+            ofh.write('\t'.join(keep(line.rstrip('\r\n').split('\t'))))
+            ofh.write('\n')
+
+
+def split_sample_columns(input_file: Path, output_files: list, shards: list):
+
+    ofhs = [x.open('wt') for x in output_files]
+
+    try:
+        with open_text(input_file) as ifh:
+            line = ifh.readline()
+            while line.startswith('#'):
+                for ofh in ofhs:
+                    ofh.write(line)
+                line = ifh.readline()
+
+            columns = line.rstrip('\r\n').split('\t')
+            column2idx = {x: i for i, x in enumerate(columns) if i > 0}
+
+            keeps = []
+            for samples in shards:
+                if not samples:
+                    raise Exception('empty shard')
+                missing = [x for x in samples if x not in column2idx]
+                if missing:
+                    raise Exception(f'{input_file}: {missing[0:5]} not found')
+                keeps.append(
+                    operator.itemgetter(0, *[column2idx[x] for x in samples]))
+
+            for keep, ofh in zip(keeps, ofhs):
+                ofh.write('\t'.join(keep(columns)))
+                ofh.write('\n')
+
+            for line in ifh:
+                fields = line.rstrip('\r\n').split('\t')
+                for keep, ofh in zip(keeps, ofhs):
+                    ofh.write('\t'.join(keep(fields)))
+                    ofh.write('\n')
+    finally:
+        for ofh in ofhs:
+            ofh.close()
+
+
+def link_or_copy(src: Path, dst: Path):
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def subset_rows(
+    input_file: Path,
+    output_file: Path,
+    keys: set,
+    key_column: str = None,
+):
+
+    with open_text(input_file) as ifh, output_file.open('wt') as ofh:
+        line = ifh.readline()
+        while line.startswith('#'):
+            ofh.write(line)
+            line = ifh.readline()
+        ofh.write(line)
+
+        if key_column is None:
+            idx = 0
+        else:
+            columns = line.rstrip('\r\n').split('\t')
+            if key_column not in columns:
+                raise Exception(f'{input_file}: no column {key_column}')
+            idx = columns.index(key_column)
+
+        for line in ifh:
+            if line.rstrip('\r\n').split('\t')[idx] in keys:
                 ofh.write(line)
 
 
+def concat_rows(input_files: list, output_file: Path):
+
+    header = None
+
+    with output_file.open('wt') as ofh:
+        for input_file in input_files:
+            with open_text(input_file) as ifh:
+                line = ifh.readline()
+                while line.startswith('#'):
+                    if header is None:
+                        ofh.write(line)
+                    line = ifh.readline()
+
+                if header is None:
+                    header = line
+                    ofh.write(header)
+                elif line != header:
+                    raise Exception(f'{input_file}: header differs')
+
+                for line in ifh:
+                    ofh.write(line)
+
+
 def _create_index(data_file):
     index = dict()
     with data_file.open('rt') as fh:
@@ -506,6 +779,97 @@ def _create_index(data_file):
     return index
 
 
+def fingerprint(filepath: Path):
+    stat = filepath.stat()
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def file_hash(filepath: Path):
+    digest = hashlib.blake2b(digest_size=16)
+
+    with filepath.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_index(data_file: Path, index_dir: Path = None):
+
+    current_fingerprint = fingerprint(data_file)
+
+    cached = _INDEXES.get(data_file)
+    if cached and cached['fingerprint'] == current_fingerprint:
+        return cached
+
+    index_file = None
+
+    if index_dir:
+        key = hashlib.blake2b(
+            str(data_file.resolve()).encode(),
+            digest_size=8,
+        ).hexdigest()
+        index_file = index_dir / f'{data_file.name}.{key}.idx'
+
+    if index_file and index_file.exists():
+        try:
+            cached = load(index_file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            cached = None
+        if cached and cached['fingerprint'] == current_fingerprint:
+            _INDEXES[data_file] = cached
+            return cached
+
+    columns, offsets = _create_binary_index(data_file)
+
+    index = {
+        'fingerprint': current_fingerprint,
+        'columns': columns,
+        'offsets': offsets,
+    }
+
+    if index_file:
+        try:
+            index_dir.mkdir(parents=True, exist_ok=True)
+            save(index, index_file)
+        except OSError:
+            logging.debug(f'cannot write index file {index_file}')
+
+    _INDEXES[data_file] = index
+
+    return index
+
+
+def read_indexed_row(fh, index, key):
+    pos = index['offsets'].get(key)
+    if pos is None:
+        return None
+    fh.seek(pos)
+    return fh.readline().decode().rstrip('\r\n').split('\t')[1:]
+
+
+def _create_binary_index(data_file):
+    columns = None
+    offsets = dict()
+    with data_file.open('rb') as fh:
+        pos = 0
+        for line in fh:
+            if line.startswith(b'#'):
+                pos += len(line)
+                continue
+
+            if columns is None:
+                columns = line.decode().rstrip('\r\n').split('\t')[1:]
+                pos += len(line)
+                continue
+
+            key = line.split(b'\t', 1)[0].decode()
+            offsets[key] = pos
+            pos += len(line)
+
+    return columns, offsets
+
+
 def merge_dynamic_column_file(
         default_file: Path,
         modified_file: Path,
@@ -513,6 +877,8 @@ def merge_dynamic_column_file(
         improved_probesets: set = set(),
         target_probesets: set = set(),
 ):
+    import pandas as pd
+
     default = pd.read_csv(
         default_file,
         comment='#',
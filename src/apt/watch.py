@@ -0,0 +1,179 @@
+import logging
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from . import cel, config, utils
+from .arguments import SampleQcArguments
+from .workflow import Workflow
+
+UNKNOWN_PLATE = 'unknown'
+
+
+class PlateWatcher():
+
+    def __init__(
+        self,
+        workflow: Workflow,
+        intake_dir: Path,
+        lib_dir: Path,
+        output_dir: Path,
+        sqc_args: SampleQcArguments,
+        plate_size: int = 96,
+        settle_seconds: float = 60,
+        plate_timeout_seconds: float = 3600,
+        force: bool = False,
+    ):
+        self._workflow = workflow
+        self._intake_dir = intake_dir
+        self._lib_dir = lib_dir
+        self._output_dir = output_dir
+        self._sqc_args = sqc_args
+        self._plate_size = plate_size
+        self._settle_seconds = settle_seconds
+        self._plate_timeout_seconds = plate_timeout_seconds
+        self._force = force
+
+        self._cels = dict()
+        self._failed_cels = dict()
+        self._last_seen = dict()
+        self._done_plates = set()
+        self._sample_qc = pd.DataFrame()
+
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def sample_qc(self):
+        return self._sample_qc
+
+    @property
+    def pending_plates(self):
+        return sorted(set(self._cels) - self._done_plates)
+
+    def run(self, poll_interval: float = 30, max_idle_polls: int = None):
+        n_idle_polls = 0
+
+        while max_idle_polls is None or n_idle_polls < max_idle_polls:
+            if self.poll():
+                n_idle_polls = 0
+            else:
+                n_idle_polls += 1
+            time.sleep(poll_interval)
+
+        self.flush()
+
+        return self._sample_qc
+
+    def poll(self):
+        now = time.time()
+        accepted_cels = self._accepted_cels()
+
+        new_cels = dict()
+        for cel_path in sorted(self._intake_dir.glob('*.[Cc][Ee][Ll]')):
+            if cel_path in accepted_cels:
+                continue
+
+            try:
+                current_fingerprint = utils.fingerprint(cel_path)
+            except FileNotFoundError:
+                continue
+
+            # failed CELs are retried once they are rewritten
+            if self._failed_cels.get(cel_path) == current_fingerprint:
+                continue
+
+            if now - current_fingerprint[1] / 1e9 < self._settle_seconds:
+                continue
+
+            new_cels[cel_path] = current_fingerprint
+
+        if new_cels:
+            headers = cel.scan_cel_headers(
+                list(new_cels),
+                cache_file=self._output_dir / config.CEL_HEADERS_FILENAME,
+            )
+
+            for _, header in headers.iterrows():
+                if pd.notna(header['error']):
+                    logging.info(f'CEL\t{header["cel_name"]}\t'
+                                 f'{header["error"]}\tfailed')
+                    self._failed_cels[header['cel_path']] = new_cels[
+                        header['cel_path']]
+                    continue
+                self._failed_cels.pop(header['cel_path'], None)
+                if pd.notna(header['sbarcode']):
+                    sbarcode = header['sbarcode']
+                else:
+                    sbarcode = UNKNOWN_PLATE
+                self._cels.setdefault(sbarcode, []).append(header['cel_path'])
+                self._last_seen[sbarcode] = now
+                self._done_plates.discard(sbarcode)
+
+        n_processed = 0
+        for sbarcode in self.pending_plates:
+            n_cels = len(self._cels[sbarcode])
+            idle_seconds = now - self._last_seen[sbarcode]
+
+            if (n_cels >= self._plate_size
+                    or idle_seconds >= self._plate_timeout_seconds):
+                self._process_plate(sbarcode)
+                n_processed += 1
+
+        return len(new_cels) + n_processed > 0
+
+    def flush(self):
+        for sbarcode in self.pending_plates:
+            self._process_plate(sbarcode)
+
+    def _accepted_cels(self):
+        accepted_cels = set()
+        for cels in self._cels.values():
+            accepted_cels.update(cels)
+        return accepted_cels
+
+    def _process_plate(self, sbarcode):
+        cel_paths = sorted(self._cels[sbarcode], key=lambda x: x.name)
+
+        logging.info(f'plate {sbarcode}: {len(cel_paths)} CELs')
+
+        plate_dir = self._output_dir / sbarcode
+
+        samples = pd.DataFrame({
+            'cel_path': [str(x) for x in cel_paths],
+            'cel_order': range(len(cel_paths)),
+        })
+
+        samples = self._workflow.validate_cels(
+            samples,
+            self._lib_dir,
+            plate_dir,
+        )
+
+        self._done_plates.add(sbarcode)
+
+        if len(samples) == 0:
+            return
+
+        dqc_report = self._workflow.dqc(
+            samples,
+            self._lib_dir,
+            plate_dir,
+            self._sqc_args,
+            self._force,
+            cache_file=self._output_dir / config.DQC_CACHE_FILENAME,
+            validate=False,
+        )
+        dqc_report = dqc_report.assign(sbarcode=sbarcode)
+
+        sample_qc = self._sample_qc
+        if len(sample_qc) > 0:
+            sample_qc = sample_qc[lambda x: x['sbarcode'] != sbarcode]
+
+        self._sample_qc = pd.concat([sample_qc, dqc_report],
+                                    ignore_index=True)
+
+        utils.df2tsv(
+            self._sample_qc,
+            self._output_dir / config.SAMPLE_QC_REPORT_FILENAME,
+        )
@@ -1,23 +1,119 @@
+import hashlib
 import logging
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
 
 import pandas as pd
 
-from . import config, utils
+from . import a5, cel, cluster_space, config, streaming, utils
 from .apt import Apt
-from .arguments import SampleQcArguments, SnvArguments
-from .library import Library
+from .arguments import (CnvArguments, SampleQcArguments, SnvArguments,
+                        TranslationArguments)
+from .compression import Compressor
+from .library import Library, get_manifest
+from .staging import Stager, StagingSession
+from .summary_store import SummaryStore
+
+_DQC_CACHE_LOCK = threading.Lock()
 
 
 class Workflow():
 
-    def __init__(self, apt_bin_dir: Path = None):
+    def __init__(
+        self,
+        apt_bin_dir: Path = None,
+        stager: Stager = None,
+        compressor: Compressor = None,
+    ):
         self._apt = Apt(apt_bin_dir)
+        self._stager = stager
+        self._compressor = compressor
 
     @property
     def apt(self):
         return self._apt
 
+    @property
+    def stager(self):
+        return self._stager
+
+    def prefetch(self, filepaths: list):
+        if self._stager:
+            self._stager.prefetch(filepaths)
+
+    @contextmanager
+    def _staging(self):
+        session = StagingSession(self._stager)
+        try:
+            yield session
+        finally:
+            session.release()
+
+    def _compress_side_outputs(self, output_dir: Path, trustcheck: bool):
+        if not self._compressor:
+            return
+        filepaths = sorted(output_dir.glob(config.BLEMISHES_PATTERN))
+        if trustcheck:
+            filepaths.append(output_dir / config.TRUSTCHECK_FILENAME)
+        self._compressor.submit(filepaths)
+
+    def validate_cels(
+        self,
+        samples: pd.DataFrame,
+        lib_dir: Path,
+        output_dir: Path,
+        n_jobs: int = 8,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        array_name = utils.get_array_name(lib_dir)
+
+        report = cel.validate_cels(
+            samples['cel_path'],
+            array_name=array_name,
+            n_jobs=n_jobs,
+        )
+        report = report.assign(
+            passing_cel_check=lambda x: x['error'].isna())
+
+        for _, record in report[lambda x: ~x['passing_cel_check']].iterrows():
+            cel_name = record['cel_name']
+            error = record['error']
+            logging.info(f'CEL\t{cel_name}\t{error}\tfailed')
+
+        utils.df2tsv(report, output_dir / config.CEL_CHECK_REPORT_FILENAME)
+
+        return samples[report['passing_cel_check'].to_numpy()]
+
+    def _validate_cels_file(
+        self,
+        cels_file: Path,
+        lib_dir: Path,
+        output_dir: Path,
+    ):
+        cel_paths = utils.tsv2df(cels_file)['cel_files']
+        samples = pd.DataFrame({
+            'cel_path': cel_paths,
+            'cel_order': range(len(cel_paths)),
+        })
+
+        passing = self.validate_cels(samples, lib_dir, output_dir)
+
+        if len(passing) == 0:
+            raise Exception(f'{cels_file}: no valid CEL files')
+
+        if len(passing) == len(samples):
+            return cels_file
+
+        valid_cels_file = output_dir / f'valid_{cels_file.name}'
+        utils.export_cels(passing, valid_cels_file)
+
+        return valid_cels_file
+
     def dqc(
         self,
         samples: pd.DataFrame,
@@ -25,39 +121,98 @@ class Workflow():
         output_dir: Path,
         sqc_args: SampleQcArguments,
         force: bool,
+        cache_file: Path = None,
+        validate: bool = True,
     ):
 
         failed = dict()
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        cels_file = output_dir / "dqc_cels.txt"
+        if validate:
+            samples = self.validate_cels(samples, lib_dir, output_dir)
 
-        utils.export_cels(samples, cels_file)
+        if len(samples) == 0:
+            return pd.DataFrame({
+                'cel_name': pd.Series(dtype='str'),
+                'dqc': pd.Series(dtype='float64'),
+                'passing_dqc': pd.Series(dtype='bool'),
+            })
 
-        cmd = self.apt.apt_geno_qc(
-            lib_dir=lib_dir,
-            args_file=sqc_args.geno_qc_args_file,
-            cel_files=cels_file,
-            output_dir=output_dir,
-            force=force,
-        )
+        if not cache_file:
+            cache_file = output_dir / config.DQC_CACHE_FILENAME
 
-        cmd.execute()
+        cache = _load_dqc_cache(cache_file)
+
+        args_hash = utils.file_hash(sqc_args.geno_qc_args_file)
+
+        keys = {
+            idx: (utils.file_hash(Path(cel_path)), args_hash)
+            for idx, cel_path in samples['cel_path'].items()
+        }
+
+        if force:
+            missed = samples
+        else:
+            missed = samples[[
+                keys[x] not in cache['records'] for x in samples.index
+            ]]
 
         outputFile = output_dir / config.GENO_QC_FILENAME
 
-        dqc_report = pd.read_csv(
-            outputFile,
-            comment='#',
-            header=0,
-            sep='\t',
-            dtype={
-                'cel_files': 'str',
-                'axiom_dishqc_DQC': 'float64'
-            },
-            usecols=['cel_files', 'axiom_dishqc_DQC'],
-        )
+        if len(missed) > 0:
+            logging.info(f'DQC\t{len(missed)} of {len(samples)} samples '
+                         'not in cache')
+
+            cels_file = output_dir / "dqc_cels.txt"
+
+            self.prefetch([sqc_args.snp_priors_file])
+
+            with self._staging() as staging:
+                utils.export_cels(staging.stage_samples(missed), cels_file)
+
+                cmd = self.apt.apt_geno_qc(
+                    lib_dir=lib_dir,
+                    args_file=sqc_args.geno_qc_args_file,
+                    cel_files=cels_file,
+                    output_dir=output_dir,
+                    force=force,
+                )
+
+                cmd.execute()
+
+            geno_qc = utils.tsv2df(outputFile)
+
+            # cel_files holds basenames only; CELs sharing a basename are
+            # matched in input order, which APT keeps
+            name2keys = dict()
+            for idx, cel_path in missed['cel_path'].items():
+                name2keys.setdefault(Path(cel_path).name, []).append(keys[idx])
+
+            records = {
+                name2keys[x['cel_files']].pop(0): x
+                for x in geno_qc.to_dict('records')
+            }
+
+            cache = _update_dqc_cache(
+                cache_file,
+                records,
+                {args_hash: _read_comment_lines(outputFile)},
+            )
+
+        geno_qc = pd.DataFrame.from_records([
+            dict(cache['records'][keys[idx]], cel_files=Path(cel_path).name)
+            for idx, cel_path in samples['cel_path'].items()
+        ])
+
+        with outputFile.open('wt') as fh:
+            fh.writelines(cache['headers'].get(args_hash, []))
+            geno_qc.to_csv(fh, sep='\t', index=False)
+
+        dqc_report = geno_qc[['cel_files', 'axiom_dishqc_DQC']].astype({
+            'cel_files': 'str',
+            'axiom_dishqc_DQC': 'float64',
+        })
 
         dqc_report = dqc_report.rename(columns={
             'cel_files': 'cel_name',
@@ -83,43 +238,264 @@ class Workflow():
         sqc_args: SampleQcArguments,
         output_dir: Path,
         force: bool,
+        stream_calls: bool = False,
     ):
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
         cels_file = output_dir / "qccr_cels.txt"
 
-        utils.export_cels(samples, cels_file)
+        with self._staging() as staging:
+            utils.export_cels(staging.stage_samples(samples), cels_file)
 
-        cmd = self.apt.apt_genotype_axiom(
-            cel_files=cels_file,
-            output_dir=output_dir,
-            lib_dir=lib_dir,
-            args_file=sqc_args.step1_args_file,
-            snp_priors_file=sqc_args.snp_priors_file,
+            cmd = self.apt.apt_genotype_axiom(
+                cel_files=cels_file,
+                output_dir=output_dir,
+                lib_dir=lib_dir,
+                args_file=sqc_args.step1_args_file,
+                snp_priors_file=staging.stage(sqc_args.snp_priors_file),
+                force=force,
+            )
+
+            calls_file = output_dir / config.CALLS_FILENAME
+
+            if stream_calls:
+                accumulator = streaming.CallRateAccumulator()
+                complete = streaming.execute_streaming(
+                    cmd,
+                    calls_file,
+                    [accumulator.feed],
+                )
+                if complete:
+                    call_rates = accumulator.report()
+                else:
+                    logging.warning(f'{calls_file} changed behind the tail; '
+                                    'reading it again')
+                    call_rates = utils.call_rate_from_calls_file(calls_file)
+            else:
+                cmd.execute()
+                call_rates = utils.call_rate_from_calls_file(calls_file)
+
+        return _qccr_report(call_rates, sqc_args)
+
+    def qccr_summary(
+        self,
+        summary_file: Path,
+        trustcheck_file: Path,
+        sqc_args: SampleQcArguments,
+        output_dir: Path,
+        gender_file: Path = None,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        if trustcheck_file:
+            trustcheck_file = utils.ensure_uncompressed(trustcheck_file)
+
+        with self._staging() as staging:
+            cmd = self.apt.apt_summary_genotype_axiom(
+                args_file=sqc_args.step1_args_file,
+                summary_file=summary_file,
+                trustcheck_file=trustcheck_file,
+                priors_file=staging.stage(sqc_args.snp_priors_file),
+                params_file=None,
+                special_snps_file=sqc_args.special_snps_file,
+                gender_file=gender_file,
+                lib_dir=sqc_args.lib_dir,
+                output_dir=output_dir,
+                use_copynumber_call_codes=None,
+                probeset_ids_file=sqc_args.probeset_ids_file,
+            )
+
+            cmd.execute()
+
+        call_rates = utils.call_rate_from_calls_file(output_dir /
+                                                     config.CALLS_FILENAME)
+
+        return _qccr_report(call_rates, sqc_args)
+
+    def genotype_summary_first(
+        self,
+        cels_file: Path,
+        sqc_args: SampleQcArguments,
+        snv_args: SnvArguments,
+        output_dir: Path,
+        force: bool,
+        gender_file: Path = None,
+        a5_format: bool = False,
+    ):
+
+        summary_file, trustcheck_file = self.export_signals(
+            cels_file=cels_file,
+            args_file=snv_args.step2_args_file,
+            lib_dir=snv_args.lib_dir,
+            output_dir=output_dir / config.SIGNALS_DIRNAME,
             force=force,
+            a5_format=a5_format,
         )
 
-        cmd.execute()
-
-        qccr_report = utils.call_rate_from_calls_file(
-            output_dir / config.CALLS_FILENAME, )
+        qccr_report = self.qccr_summary(
+            summary_file=summary_file,
+            trustcheck_file=trustcheck_file,
+            sqc_args=sqc_args,
+            output_dir=output_dir / config.SAMPLE_QC_DIRNAME,
+            gender_file=gender_file,
+        )
 
-        qccr_report = qccr_report.rename(columns={'call_rate': 'qccr'})
-        qccr_report = qccr_report.round(10)
+        failed = set(qccr_report[lambda x: ~x['passing_qccr']]['cel_name'])
 
-        qccr_report = qccr_report.assign(
-            passing_qccr=lambda x: x['qccr'] >= sqc_args.qccr_threshold)
+        if failed and summary_file.suffix == '.a5':
+            logging.warning(f'{len(failed)} samples failed QCCR; '
+                            'genotyping from a text summary without them')
+            summary_file = a5.export_summaries(
+                summary_file,
+                output_dir / config.SIGNALS_DIRNAME / config.SUMMARY_FILENAME,
+                precision=config.FLOATING_POINT_PRECISION,
+            )
 
-        failed = qccr_report[lambda x: x['passing_qccr'] == False]
+        if failed:
+            summary_file, trustcheck_file = self.drop_samples(
+                summary_file=summary_file,
+                trustcheck_file=trustcheck_file,
+                cel_names=failed,
+                output_dir=output_dir / config.SIGNALS_DIRNAME / 'passing',
+            )
 
-        for _, record in failed.iterrows():
-            cel_name = record['cel_name']
-            qccr = record['qccr']
-            logging.info(f'QCCR\t{cel_name}\t{qccr:5.2f}\tfailed')
+        self.genotype_summary(
+            summary_file=summary_file,
+            trustcheck_file=trustcheck_file,
+            gender_file=gender_file,
+            output_dir=output_dir / config.SNV_DIRNAME,
+            snv_args=snv_args,
+        )
 
         return qccr_report
 
+    def drop_samples(
+        self,
+        summary_file: Path,
+        trustcheck_file: Path,
+        cel_names: set,
+        output_dir: Path,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        logging.info(f'dropping {len(cel_names)} samples from {summary_file}')
+
+        reduced_summary_file = output_dir / summary_file.name
+        utils.drop_sample_columns(summary_file, reduced_summary_file,
+                                  cel_names)
+
+        if (trustcheck_file
+                and utils.resolve_compressed(trustcheck_file).exists()):
+            reduced_trustcheck_file = output_dir / trustcheck_file.name
+            utils.drop_sample_columns(trustcheck_file,
+                                      reduced_trustcheck_file, cel_names)
+        else:
+            reduced_trustcheck_file = trustcheck_file
+
+        return reduced_summary_file, reduced_trustcheck_file
+
+    def sample_qc_pipelined(
+        self,
+        samples: pd.DataFrame,
+        lib_dir: Path,
+        sqc_args: SampleQcArguments,
+        output_dir: Path,
+        force: bool,
+        dqc_chunk_size: int = 96,
+        min_qccr_chunk_size: int = 384,
+        n_jobs: int = 4,
+        stream_calls: bool = False,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        cache_file = output_dir / config.DQC_CACHE_FILENAME
+
+        chunks = [
+            samples.iloc[i:i + dqc_chunk_size]
+            for i in range(0, len(samples), dqc_chunk_size)
+        ]
+
+        dqc_reports = dict()
+        qccr_futures = []
+        queued = []
+        held = []
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as dqc_executor, \
+                ThreadPoolExecutor(max_workers=n_jobs) as qccr_executor:
+
+            def submit_qccr(queued):
+                n = len(qccr_futures)
+                chunk_dir = output_dir / 'qccr' / f'chunk_{n:04d}'
+                logging.info(f'QCCR\tsubmitting {len(queued)} samples')
+                qccr_futures.append(
+                    qccr_executor.submit(
+                        self.qccr,
+                        samples=pd.concat(queued),
+                        lib_dir=lib_dir,
+                        sqc_args=sqc_args,
+                        output_dir=chunk_dir,
+                        force=force,
+                        stream_calls=stream_calls,
+                    ))
+
+            dqc_futures = {
+                dqc_executor.submit(
+                    self.dqc,
+                    samples=chunk,
+                    lib_dir=lib_dir,
+                    output_dir=output_dir / 'dqc' / f'chunk_{i:04d}',
+                    sqc_args=sqc_args,
+                    force=force,
+                    cache_file=cache_file,
+                ): i
+                for i, chunk in enumerate(chunks)
+            }
+
+            for future in as_completed(dqc_futures):
+                i = dqc_futures[future]
+                chunk = chunks[i]
+                dqc_report = future.result()
+                dqc_reports[i] = dqc_report
+
+                if len(dqc_report) == 0:
+                    continue
+
+                passing = set(
+                    dqc_report[lambda x: x['passing_dqc']]['cel_name'])
+                queued.append(chunk[[
+                    Path(x).name in passing for x in chunk['cel_path']
+                ]])
+
+                # a full chunk is held back until the next one fills, so
+                # that leftovers can join it instead of running alone
+                if sum(len(x) for x in queued) >= min_qccr_chunk_size:
+                    if held:
+                        submit_qccr(held)
+                    held = queued
+                    queued = []
+
+            if sum(len(x) for x in held + queued) > 0:
+                submit_qccr(held + queued)
+
+            qccr_reports = [x.result() for x in qccr_futures]
+
+        dqc_report = pd.concat(
+            [dqc_reports[i] for i in sorted(dqc_reports)],
+            ignore_index=True,
+        )
+
+        if qccr_reports:
+            qccr_report = pd.concat(qccr_reports, ignore_index=True)
+        else:
+            qccr_report = pd.DataFrame(
+                columns=['cel_name', 'qccr', 'passing_qccr'])
+
+        return dqc_report, qccr_report
+
     def plate_qc(
         samples: pd.DataFrame,
         output_dir: Path,
@@ -146,8 +522,15 @@ class Workflow():
         output_dir: Path,
         snv_args: SnvArguments,
         skip_qc: bool = False,
+        probeset_ids_file: Path = None,
     ):
 
+        if not probeset_ids_file:
+            probeset_ids_file = snv_args.probeset_ids_file
+
+        if trustcheck_file:
+            trustcheck_file = utils.ensure_uncompressed(trustcheck_file)
+
         self.apt.apt_summary_genotype_axiom(
             args_file=snv_args.step2_args_file,
             summary_file=summary_file,
@@ -159,6 +542,7 @@ class Workflow():
             lib_dir=snv_args.lib_dir,
             output_dir=output_dir,
             use_copynumber_call_codes=snv_args.copynumber_call_codes,
+            probeset_ids_file=probeset_ids_file,
             rare_het_adjustment=snv_args.rare_het_adjustment,
         ).execute()
 
@@ -175,6 +559,73 @@ class Workflow():
             output_dir=output_dir,
         )
 
+    def regenotype_probesets(
+        self,
+        probesets_file: Path,
+        snv_dir: Path,
+        snv_args: SnvArguments,
+        gender_file: Path = None,
+    ):
+
+        _check_posteriors(snv_dir / config.POSTERIORS_FILENAME)
+
+        probeset_ids = utils.load_probesets(probesets_file)
+
+        work_dir = snv_dir / config.TMP_DIRNAME / probesets_file.stem
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        logging.info(f'regenotyping {len(probeset_ids)} probesets '
+                     f'from {probesets_file}')
+
+        subset_probesets_file = work_dir / probesets_file.name
+        utils.export_probesets(sorted(probeset_ids), subset_probesets_file)
+
+        summary_file = work_dir / config.SUMMARY_FILENAME
+        utils.subset_file(
+            snv_dir / config.SUMMARY_FILENAME,
+            summary_file,
+            probeset_ids,
+        )
+
+        trustcheck_file = utils.ensure_uncompressed(snv_dir /
+                                                    config.TRUSTCHECK_FILENAME)
+        if not trustcheck_file.exists():
+            trustcheck_file = None
+
+        # keep the genders of the full batch; APT would otherwise call them
+        # again from the subset's signals only
+        report_file = snv_dir / config.REPORT_FILENAME
+        if not gender_file and report_file.exists():
+            gender_file = work_dir / config.GENDER_FILENAME
+            _export_genders(report_file, gender_file)
+
+        self.genotype_summary(
+            summary_file=summary_file,
+            trustcheck_file=trustcheck_file,
+            gender_file=gender_file,
+            output_dir=work_dir,
+            snv_args=snv_args,
+            skip_qc=True,
+            probeset_ids_file=subset_probesets_file,
+        )
+
+        for filename in [
+                config.CALLS_FILENAME,
+                config.CONFIDENCES_FILENAME,
+                config.POSTERIORS_FILENAME,
+                config.MULTI_POSTERIORS_FILENAME,
+        ]:
+            _merge_back(snv_dir, work_dir, filename)
+
+        self.snv_qc_incremental(
+            probeset_ids=probeset_ids,
+            snv_dir=snv_dir,
+            snv_args=snv_args,
+            work_dir=work_dir / config.SAMPLE_QC_DIRNAME,
+        )
+
+        return probeset_ids
+
     def genotype(
         self,
         cels_file: Path,
@@ -182,29 +633,51 @@ class Workflow():
         output_dir: Path,
         cnpscalls_file: Path,
         force: bool,
+        transform_signals: bool = False,
+        skip_qc: bool = False,
+        validate: bool = True,
     ):
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        cmd = self.apt.apt_genotype_axiom(
-            cel_files=cels_file,
-            output_dir=output_dir,
-            lib_dir=snv_args.lib_dir,
-            args_file=snv_args.step2_args_file,
-            snp_priors_file=snv_args.snp_priors_file,
-            snp_params_file=snv_args.snp_params_file,
-            probeset_ids_file=snv_args.probeset_ids_file,
-            rare_het_adjustment=snv_args.rare_het_adjustment,
-            force=force,
-            process_multi_alleles=snv_args.multi_alleles,
-            use_copynumber_call_codes=snv_args.copynumber_call_codes,
-            cnpscalls_file=cnpscalls_file,
-            export_allele_summaries=True,
-            dump_blemishes=True,
-            export_trustcheck=True,
-        )
+        if validate:
+            cels_file = self._validate_cels_file(
+                cels_file,
+                snv_args.lib_dir,
+                output_dir,
+            )
 
-        cmd.execute()
+        with self._staging() as staging:
+            cmd = self.apt.apt_genotype_axiom(
+                cel_files=staging.stage_cels_file(
+                    cels_file,
+                    output_dir / f'staged_{cels_file.name}',
+                ),
+                output_dir=output_dir,
+                lib_dir=snv_args.lib_dir,
+                args_file=snv_args.step2_args_file,
+                snp_priors_file=staging.stage(snv_args.snp_priors_file),
+                snp_params_file=staging.stage(snv_args.snp_params_file),
+                probeset_ids_file=snv_args.probeset_ids_file,
+                rare_het_adjustment=snv_args.rare_het_adjustment,
+                force=force,
+                process_multi_alleles=snv_args.multi_alleles,
+                use_copynumber_call_codes=snv_args.copynumber_call_codes,
+                cnpscalls_file=cnpscalls_file,
+                export_allele_summaries=True,
+                dump_blemishes=True,
+                export_trustcheck=True,
+            )
+
+            cmd.execute()
+
+        self._compress_side_outputs(output_dir, trustcheck=True)
+
+        if transform_signals:
+            self.transform_signals(output_dir / config.SUMMARY_FILENAME)
+
+        if skip_qc:
+            return
 
         self.snv_qc(
             summary_file=output_dir / config.SUMMARY_FILENAME,
@@ -217,6 +690,120 @@ class Workflow():
             output_dir=output_dir,
         )
 
+    def add_samples(
+        self,
+        samples: pd.DataFrame,
+        snv_args: SnvArguments,
+        store_dir: Path,
+        output_dir: Path,
+        force: bool,
+        gender_file: Path = None,
+    ):
+
+        store = SummaryStore(store_dir)
+        stored = set(store.samples)
+
+        new_samples = samples[[
+            Path(x).name not in stored for x in samples['cel_path']
+        ]]
+
+        if len(new_samples) > 0:
+            chunk_dir = store.next_chunk_dir()
+            cels_file = chunk_dir / 'cels.txt'
+            utils.export_cels(new_samples, cels_file)
+
+            summary_file, trustcheck_file = self.export_signals(
+                cels_file=cels_file,
+                args_file=snv_args.step2_args_file,
+                lib_dir=snv_args.lib_dir,
+                output_dir=chunk_dir,
+                force=force,
+            )
+
+            store.add_chunk(summary_file, trustcheck_file)
+        else:
+            logging.info(f'no new samples for summary store {store_dir}')
+
+        summary_file, trustcheck_file = store.combine(
+            output_dir / config.SIGNALS_DIRNAME)
+
+        self.genotype_summary(
+            summary_file=summary_file,
+            trustcheck_file=trustcheck_file,
+            gender_file=gender_file,
+            output_dir=output_dir / config.SNV_DIRNAME,
+            snv_args=snv_args,
+        )
+
+        return store
+
+    def genotype_mega_batch(
+        self,
+        samples: pd.DataFrame,
+        snv_args: SnvArguments,
+        output_dir: Path,
+        force: bool,
+        batch_size: int = 960,
+        n_jobs: int = 4,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        samples = samples.sort_values('cel_order')
+
+        batch_dirs = []
+        for i in range(0, len(samples), batch_size):
+            batch_dir = output_dir / 'batches' / f'batch_{len(batch_dirs):04d}'
+            batch_dir.mkdir(parents=True, exist_ok=True)
+            utils.export_cels(samples.iloc[i:i + batch_size],
+                              batch_dir / 'cels.txt')
+            batch_dirs.append(batch_dir)
+
+        logging.info(f'genotyping {len(samples)} samples '
+                     f'in {len(batch_dirs)} batches')
+
+        self.prefetch([snv_args.snp_priors_file, snv_args.snp_params_file])
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(
+                    self.genotype,
+                    cels_file=batch_dir / 'cels.txt',
+                    snv_args=snv_args,
+                    output_dir=batch_dir,
+                    cnpscalls_file=None,
+                    force=force,
+                    skip_qc=True,
+                ) for batch_dir in batch_dirs
+            ]
+            for future in futures:
+                future.result()
+
+        for filename in [
+                config.CALLS_FILENAME,
+                config.CONFIDENCES_FILENAME,
+                config.SUMMARY_FILENAME,
+        ]:
+            utils.paste_columns(
+                [x / filename for x in batch_dirs],
+                output_dir / filename,
+            )
+
+        utils.concat_rows(
+            [x / config.REPORT_FILENAME for x in batch_dirs],
+            output_dir / config.REPORT_FILENAME,
+        )
+
+        # every batch fits its own cluster posteriors, which cannot be
+        # pasted together; the merged directory deliberately has none, so
+        # probeset QC has to run per batch
+        (output_dir / config.POSTERIORS_FILENAME).unlink(missing_ok=True)
+
+        return batch_dirs
+
+    def transform_signals(self, summary_file: Path):
+        return cluster_space.load_cluster_space(summary_file)
+
     def snv_qc(
         self,
         summary_file: Path,
@@ -227,6 +814,8 @@ class Workflow():
         output_dir: Path,
         multi_posteriors_file: Path = None,
     ):
+        _check_posteriors(posteriors_file)
+
         output_dir.mkdir(parents=True, exist_ok=True)
 
         ps_metrics_cmd = self.apt.ps_metrics(
@@ -259,6 +848,551 @@ class Workflow():
         )
         ps_classification_cmd.execute()
 
+    def snv_qc_incremental(
+        self,
+        probeset_ids: set,
+        snv_dir: Path,
+        snv_args: SnvArguments,
+        work_dir: Path,
+    ):
+
+        _check_posteriors(snv_dir / config.POSTERIORS_FILENAME)
+
+        metrics_dir = work_dir / 'metrics'
+        classification_dir = work_dir / 'classification'
+        metrics_dir.mkdir(parents=True, exist_ok=True)
+        classification_dir.mkdir(parents=True, exist_ok=True)
+
+        for filename in [
+                config.SUMMARY_FILENAME,
+                config.CALLS_FILENAME,
+                config.POSTERIORS_FILENAME,
+                config.MULTI_POSTERIORS_FILENAME,
+        ]:
+            if (snv_dir / filename).exists():
+                utils.subset_file(
+                    snv_dir / filename,
+                    metrics_dir / filename,
+                    probeset_ids,
+                )
+
+        self.apt.ps_metrics(
+            report_file=snv_dir / config.REPORT_FILENAME,
+            calls_file=metrics_dir / config.CALLS_FILENAME,
+            summary_file=metrics_dir / config.SUMMARY_FILENAME,
+            posteriors_file=metrics_dir / config.POSTERIORS_FILENAME,
+            multi_posteriors_file=metrics_dir
+            / config.MULTI_POSTERIORS_FILENAME,
+            output_dir=metrics_dir,
+            ps_metrics_thresholds=snv_args.ps_metrics_thresholds,
+            genotype_freq_file=snv_args.genotype_freq_file,
+            special_snps_file=snv_args.special_snps_file,
+        ).execute()
+
+        for filename in [
+                config.METRICS_FILENAME,
+                config.MULTI_METRICS_FILENAME,
+        ]:
+            _merge_back(snv_dir, metrics_dir, filename)
+
+        # best-probeset selection is per SNP, so every probeset sharing a
+        # SNP with a changed probeset has to be classified again
+        ps2snp = utils.load_ps2snp(snv_args.ps2snp_file)
+        snps = {ps2snp[x] for x in probeset_ids if x in ps2snp}
+        affected = {x for x, snp in ps2snp.items() if snp in snps}
+        affected.update(probeset_ids)
+
+        logging.info(f'classifying {len(affected)} probesets '
+                     f'of {len(snps)} SNPs')
+
+        for filename in [
+                config.METRICS_FILENAME,
+                config.MULTI_METRICS_FILENAME,
+        ]:
+            if (snv_dir / filename).exists():
+                utils.subset_file(
+                    snv_dir / filename,
+                    classification_dir / filename,
+                    affected,
+                )
+
+        ps2snp_file = classification_dir / snv_args.ps2snp_file.name
+        utils.subset_file(snv_args.ps2snp_file, ps2snp_file, affected)
+
+        self.apt.ps_classification(
+            metrics_file=classification_dir / config.METRICS_FILENAME,
+            output_dir=classification_dir,
+            psct_file=snv_args.psct_file,
+            ps2snp_file=ps2snp_file,
+            multi_metrics_file=classification_dir
+            / config.MULTI_METRICS_FILENAME,
+            ps_classification_thresholds=snv_args
+            .ps_classification_thresholds,
+        ).execute()
+
+        _merge_back(
+            snv_dir,
+            classification_dir,
+            config.PS_PERFORMANCE_FILENAME,
+        )
+
+        # an affected probeset may have left a category the subset run no
+        # longer writes, so it is removed from every category list first;
+        # other .ps files in snv_dir are inputs and left alone
+        ps_filenames = [f'{x}.ps' for x in config.CONVERSION_TYPES]
+        ps_filenames.append(config.RECOMMENDED_FILENAME)
+
+        classified = {
+            x: utils.load_probesets(classification_dir / x)
+            for x in ps_filenames if (classification_dir / x).exists()
+        }
+
+        for ps_filename in ps_filenames:
+            if (ps_filename not in classified
+                    and not (snv_dir / ps_filename).exists()):
+                continue
+            probesets = classified.get(ps_filename, set())
+            if (snv_dir / ps_filename).exists():
+                kept = utils.load_probesets(snv_dir / ps_filename) - affected
+                probesets.update(kept)
+            utils.export_probesets(sorted(probesets), snv_dir / ps_filename)
+
+        return affected
+
+    def cnv(
+        self,
+        snv_dir: Path,
+        cnv_args: CnvArguments,
+        output_dir: Path,
+        self_reference: bool = True,
+        hmm_shard_size: int = None,
+        n_jobs: int = 4,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        # the binary summary is read directly unless HMM shards have to be
+        # cut from the text one
+        summary_file = snv_dir / config.SUMMARY_A5_FILENAME
+        if hmm_shard_size or not summary_file.exists():
+            summary_file = snv_dir / config.SUMMARY_FILENAME
+
+        report_file = snv_dir / config.REPORT_FILENAME
+        calls_file = snv_dir / config.CALLS_FILENAME
+
+        with self._staging() as staging:
+            if self_reference:
+                self.apt.create_cnref_from_summary(
+                    lib_dir=cnv_args.lib_dir,
+                    args_file=cnv_args.cnref_args_file,
+                    summary_file=summary_file,
+                    report_file=report_file,
+                    calls_file=calls_file,
+                    output_dir=output_dir,
+                    annotdb_file=staging.stage(cnv_args.annotdb_file),
+                    special_snps_file=cnv_args.special_snps_file,
+                    cn_models_template_file=cnv_args.cn_models_template_file,
+                ).execute()
+                cnref_file = output_dir / config.CNREF_FILENAME
+            else:
+                cnref_file = staging.stage(cnv_args.cnref_file)
+
+            if hmm_shard_size and summary_file.suffix == '.txt':
+                self.cnv_hmm_sharded(
+                    snv_dir=snv_dir,
+                    cnv_args=cnv_args,
+                    cnref_file=cnref_file,
+                    output_dir=output_dir,
+                    shard_size=hmm_shard_size,
+                    n_jobs=n_jobs,
+                )
+            else:
+                self.apt.apt_copynumber_axiom_hmm(
+                    summary_file=summary_file,
+                    report_file=report_file,
+                    calls_file=calls_file,
+                    confidences_file=snv_dir / config.CONFIDENCES_FILENAME,
+                    output_dir=output_dir,
+                    lib_dir=cnv_args.lib_dir,
+                    args_file=cnv_args.cnvhmm_args_file,
+                    cnref_file=cnref_file,
+                ).execute()
+
+            self.apt.apt_copynumber_axiom_cnvmix(
+                summary_file=summary_file,
+                report_file=report_file,
+                output_dir=output_dir,
+                lib_dir=cnv_args.lib_dir,
+                args_file=cnv_args.cnvmix_args_file,
+                cnref_file=cnref_file,
+                cn_controls_file=cnv_args.cn_controls_file,
+            ).execute()
+
+        return cnref_file
+
+    def cnv_hmm_sharded(
+        self,
+        snv_dir: Path,
+        cnv_args: CnvArguments,
+        cnref_file: Path,
+        output_dir: Path,
+        shard_size: int = 500,
+        n_jobs: int = 4,
+    ):
+
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+        summary_file = snv_dir / config.SUMMARY_FILENAME
+
+        samples = utils.read_sample_columns(summary_file)
+        shards = [
+            samples[i:i + shard_size]
+            for i in range(0, len(samples), shard_size)
+        ]
+        shard_dirs = [
+            output_dir / 'shards' / f'shard_{i:04d}'
+            for i in range(len(shards))
+        ]
+
+        logging.info(f'HMM\t{len(samples)} samples in {len(shards)} shards')
+
+        for shard_dir in shard_dirs:
+            shard_dir.mkdir(parents=True, exist_ok=True)
+
+        for filename in [
+                config.SUMMARY_FILENAME,
+                config.CALLS_FILENAME,
+                config.CONFIDENCES_FILENAME,
+        ]:
+            utils.split_sample_columns(
+                snv_dir / filename,
+                [x / filename for x in shard_dirs],
+                shards,
+            )
+
+        for shard, shard_dir in zip(shards, shard_dirs):
+            utils.subset_rows(
+                snv_dir / config.REPORT_FILENAME,
+                shard_dir / config.REPORT_FILENAME,
+                set(shard),
+            )
+
+        self._execute_all([
+            self.apt.apt_copynumber_axiom_hmm(
+                summary_file=shard_dir / config.SUMMARY_FILENAME,
+                report_file=shard_dir / config.REPORT_FILENAME,
+                calls_file=shard_dir / config.CALLS_FILENAME,
+                confidences_file=shard_dir / config.CONFIDENCES_FILENAME,
+                output_dir=shard_dir,
+                lib_dir=cnv_args.lib_dir,
+                args_file=cnv_args.cnvhmm_args_file,
+                cnref_file=cnref_file,
+            ) for shard_dir in shard_dirs
+        ], n_jobs)
+
+        inputs = {
+            config.SUMMARY_FILENAME,
+            config.CALLS_FILENAME,
+            config.CONFIDENCES_FILENAME,
+            config.REPORT_FILENAME,
+        }
+
+        outputs = {
+            x.name
+            for shard_dir in shard_dirs for x in shard_dir.iterdir()
+            if x.suffix in {'.txt', '.tsv'} and x.name not in inputs
+        }
+
+        for filename in sorted(outputs):
+            shard_files = [
+                x / filename for x in shard_dirs if (x / filename).exists()
+            ]
+            if len(shard_files) < len(shard_dirs):
+                logging.warning(f'HMM\t{filename} missing in '
+                                f'{len(shard_dirs) - len(shard_files)} shards')
+            utils.concat_rows(shard_files, output_dir / filename)
+
+        return shard_dirs
+
+    def export_cnv(
+        self,
+        cnv_dir: Path,
+        cnv_args: CnvArguments,
+        output_dir: Path,
+        ax_thresholds_dir: Path = None,
+        n_jobs: int = 4,
+    ):
+
+        shard_dirs = sorted((cnv_dir / 'shards').glob('shard_*'))
+        if not shard_dirs:
+            shard_dirs = [cnv_dir]
+
+        with self._staging() as staging:
+            annotdb_file = staging.stage(cnv_args.annotdb_file)
+
+            igv_dir = output_dir / config.IGV_DIRNAME
+            axas_dir = output_dir / config.AXAS_DIRNAME
+
+            jobs = []
+            for shard_dir in shard_dirs:
+                igv_shard_dir = igv_dir / 'shards' / shard_dir.name
+                igv_shard_dir.mkdir(parents=True, exist_ok=True)
+                jobs.append((
+                    self.apt.export_cnv_igv(
+                        cndata_file=shard_dir / config.HMM_CNV_FILENAME,
+                        annotdb_file=annotdb_file,
+                        output_dir=igv_shard_dir,
+                    ),
+                    igv_shard_dir,
+                    igv_dir,
+                ))
+
+                if not ax_thresholds_dir:
+                    continue
+
+                axas_shard_dir = axas_dir / 'shards' / shard_dir.name
+                axas_shard_dir.mkdir(parents=True, exist_ok=True)
+                jobs.append((
+                    self.apt.export_cnv_axas(
+                        cnv_dir=shard_dir,
+                        output_dir=axas_shard_dir,
+                        ax_thresholds_dir=ax_thresholds_dir,
+                    ),
+                    axas_shard_dir,
+                    axas_dir,
+                ))
+
+            self._execute_all([x[0] for x in jobs], n_jobs)
+
+        for final_dir in [igv_dir, axas_dir]:
+            shards = {x.name: x for _, x, y in jobs if y == final_dir}
+            if shards:
+                _assemble_shards(shards, final_dir)
+
+        return igv_dir, axas_dir
+
+    def package_snv(
+        self,
+        snv_dir: Path,
+        output_dir: Path,
+        species: str,
+        geno_qc_file: Path = None,
+        shard_size: int = 500,
+        n_jobs: int = 4,
+    ):
+
+        samples = utils.read_sample_columns(snv_dir / config.CALLS_FILENAME)
+        shards = [
+            samples[i:i + shard_size]
+            for i in range(0, len(samples), shard_size)
+        ]
+
+        work_dir = output_dir / config.TMP_DIRNAME
+        data_dirs = [work_dir / f'data_{i:04d}' for i in range(len(shards))]
+        batch_dirs = [work_dir / f'batch_{i:04d}' for i in range(len(shards))]
+
+        for data_dir, batch_dir in zip(data_dirs, batch_dirs):
+            data_dir.mkdir(parents=True, exist_ok=True)
+            batch_dir.mkdir(parents=True, exist_ok=True)
+
+        for filename in [
+                config.CALLS_FILENAME,
+                config.CONFIDENCES_FILENAME,
+                config.SUMMARY_FILENAME,
+        ]:
+            if (snv_dir / filename).exists():
+                utils.split_sample_columns(
+                    snv_dir / filename,
+                    [x / filename for x in data_dirs],
+                    shards,
+                )
+
+        for shard, data_dir in zip(shards, data_dirs):
+            utils.subset_rows(
+                snv_dir / config.REPORT_FILENAME,
+                data_dir / config.REPORT_FILENAME,
+                set(shard),
+            )
+            for filename in [
+                    config.POSTERIORS_FILENAME,
+                    config.MULTI_POSTERIORS_FILENAME,
+            ]:
+                if (snv_dir / filename).exists():
+                    utils.link_or_copy(snv_dir / filename, data_dir / filename)
+
+        self._execute_all([
+            self.apt.apt_package_util(
+                genotype_data_dir=data_dir,
+                performance_file=snv_dir / config.PS_PERFORMANCE_FILENAME,
+                batch_folder=batch_dir,
+                species=species,
+                geno_qc_file=geno_qc_file,
+            ) for data_dir, batch_dir in zip(data_dirs, batch_dirs)
+        ], n_jobs)
+
+        _assemble_shards({x.name: x for x in batch_dirs}, output_dir)
+
+        return output_dir
+
+    def translate(
+        self,
+        axas_dir: Path,
+        cn_region_calls_file: Path,
+        marker_list_file: Path,
+        tx_args: TranslationArguments,
+        samples: list,
+        output_dir: Path,
+        shard_size: int = 96,
+        n_jobs: int = 4,
+        sample_column: str = config.CN_REGION_CALLS_SAMPLE_COLUMN,
+    ):
+
+        tx_dir = output_dir / config.TRANSLATION_DIRNAME
+        shards = [
+            samples[i:i + shard_size]
+            for i in range(0, len(samples), shard_size)
+        ]
+
+        sample_stems = {Path(x).stem for x in samples}
+        entries = sorted(axas_dir.iterdir())
+
+        jobs = []
+        for i, shard in enumerate(shards):
+            shard_dir = tx_dir / 'shards' / f'shard_{i:04d}'
+            batch_dir = shard_dir / 'batch'
+            shard_output_dir = shard_dir / 'out'
+            batch_dir.mkdir(parents=True, exist_ok=True)
+            shard_output_dir.mkdir(parents=True, exist_ok=True)
+
+            shard_stems = {Path(x).stem for x in shard}
+            for entry in entries:
+                stem = _sample_stem(entry.name, sample_stems)
+                if stem is None or stem in shard_stems:
+                    link = batch_dir / entry.name
+                    if not link.exists():
+                        link.symlink_to(entry.resolve())
+
+            shard_calls_file = shard_dir / cn_region_calls_file.name
+            utils.subset_rows(
+                cn_region_calls_file,
+                shard_calls_file,
+                set(shard) | {Path(x).name for x in shard},
+                key_column=sample_column,
+            )
+
+            cmd = self.apt.apt_dmet_translation(
+                axas_dir=batch_dir,
+                cn_region_calls_file=shard_calls_file,
+                marker_list_file=marker_list_file,
+                lib_dir=tx_args.lib_dir,
+                translation_file=tx_args.translation_file,
+                metabolizer_file=tx_args.metabolizer_file,
+                annotation_file=tx_args.dc_annot_file,
+                output_dir=shard_output_dir,
+            )
+            jobs.append((shard_dir.name, len(shard), cmd, shard_output_dir))
+
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            errors = list(
+                executor.map(lambda x: _run_translation(x[2], x[3]), jobs))
+
+        report = pd.DataFrame({
+            'shard': [x[0] for x in jobs],
+            'n_samples': [x[1] for x in jobs],
+            'error': errors,
+        })
+
+        assembled = dict()
+        for (shard, _, _, shard_output_dir), error in zip(jobs, errors):
+            if error:
+                logging.warning(f'TX\t{shard}\t{error}\tfailed')
+                continue
+            assembled[shard] = shard_output_dir
+
+        _assemble_shards(assembled, tx_dir)
+
+        utils.df2tsv(report, tx_dir / config.TRANSLATION_SHARDS_FILENAME)
+
+        return report
+
+    def otv(
+        self,
+        genotype_dir: Path,
+        probesets_file: Path,
+        n_jobs: int = 4,
+    ):
+
+        otv_dir = genotype_dir / 'OTV'
+        otv_dir.mkdir(parents=True, exist_ok=True)
+
+        otv_probesets = utils.load_probesets(probesets_file)
+
+        # subset the calls once; the shards are split from the subset
+        calls_file = otv_dir / 'shards' / config.CALLS_FILENAME
+        calls_file.parent.mkdir(parents=True, exist_ok=True)
+        probeset_ids = utils.subset_file(
+            genotype_dir / config.CALLS_FILENAME,
+            calls_file,
+            set(otv_probesets),
+        )
+
+        if not probeset_ids:
+            logging.info(f'OTV\tno probesets of {probesets_file} called')
+            return otv_dir
+
+        shard_size = -(-len(probeset_ids) // n_jobs)
+        shards = [
+            probeset_ids[i:i + shard_size]
+            for i in range(0, len(probeset_ids), shard_size)
+        ]
+        shard_dirs = [
+            otv_dir / 'shards' / f'shard_{i:04d}' for i in range(len(shards))
+        ]
+        probeset_shards = {
+            probeset_id: i
+            for i, shard in enumerate(shards)
+            for probeset_id in shard
+        }
+
+        for shard, shard_dir in zip(shards, shard_dirs):
+            (shard_dir / 'OTV').mkdir(parents=True, exist_ok=True)
+            utils.export_probesets(shard, shard_dir / probesets_file.name)
+
+        for input_file, filename in [
+            (genotype_dir / config.POSTERIORS_FILENAME,
+             config.POSTERIORS_FILENAME),
+            (calls_file, config.CALLS_FILENAME),
+            (genotype_dir / config.CONFIDENCES_FILENAME,
+             config.CONFIDENCES_FILENAME),
+            (genotype_dir / config.SUMMARY_FILENAME, config.SUMMARY_FILENAME),
+        ]:
+            utils.split_file(
+                input_file,
+                [x / filename for x in shard_dirs],
+                probeset_shards,
+            )
+
+        self._execute_all([
+            self.apt.otv_caller(shard_dir, shard_dir / probesets_file.name)
+            for shard_dir in shard_dirs
+        ], n_jobs)
+
+        for output_file in sorted((shard_dirs[0] / 'OTV').iterdir()):
+            if output_file.suffix == '.log':
+                continue
+            utils.concat_rows(
+                [x / 'OTV' / output_file.name for x in shard_dirs],
+                otv_dir / output_file.name,
+            )
+
+        return otv_dir
+
+    def _execute_all(self, cmds: list, n_jobs: int):
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [executor.submit(x.execute) for x in cmds]
+            for future in futures:
+                future.result()
+
     def export_snv(
         self,
         snv_dir: Path,
@@ -268,24 +1402,26 @@ class Workflow():
         export_plink: bool,
         probesets_file: Path = None,
     ):
-        annotdb_file = utils.find_file(lib_dir, '*annot.db')
-
-        if export_vcf:
-            vcf_dir = output_dir / 'vcf'
-            self._export_vcf(
-                snv_dir,
-                vcf_dir,
-                annotdb_file,
-                probesets_file,
-            )
-        if export_plink:
-            plink_dir = output_dir / 'plink'
-            self._export_plink(
-                snv_dir,
-                plink_dir,
-                annotdb_file,
-                probesets_file,
-            )
+        with self._staging() as staging:
+            annotdb_file = staging.stage(
+                get_manifest(lib_dir).find_file('*annot.db'))
+
+            if export_vcf:
+                vcf_dir = output_dir / 'vcf'
+                self._export_vcf(
+                    snv_dir,
+                    vcf_dir,
+                    annotdb_file,
+                    probesets_file,
+                )
+            if export_plink:
+                plink_dir = output_dir / 'plink'
+                self._export_plink(
+                    snv_dir,
+                    plink_dir,
+                    annotdb_file,
+                    probesets_file,
+                )
 
     def _export_vcf(self, snv_dir: Path, output_dir: Path, annotdb_file: Path,
                     probesets_file: Path):
@@ -379,19 +1515,34 @@ class Workflow():
         lib_dir: Path,
         output_dir: Path,
         force: bool,
+        a5_format: bool = False,
     ):
 
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        cmd = self.apt.export_signals(
-            cels_file=cels_file,
-            output_dir=output_dir,
-            lib_dir=lib_dir,
-            force=force,
-            args_file=args_file,
-        )
+        with self._staging() as staging:
+            cmd = self.apt.export_signals(
+                cel_files=staging.stage_cels_file(
+                    cels_file,
+                    output_dir / f'staged_{cels_file.name}',
+                ),
+                output_dir=output_dir,
+                lib_dir=lib_dir,
+                force=force,
+                args_file=args_file,
+                a5_format=a5_format,
+            )
 
-        cmd.execute()
+            cmd.execute()
+
+        self._compress_side_outputs(output_dir, trustcheck=False)
+
+        if a5_format:
+            summary_file = output_dir / config.SUMMARY_A5_FILENAME
+        else:
+            summary_file = output_dir / config.SUMMARY_FILENAME
+
+        return summary_file, output_dir / config.TRUSTCHECK_FILENAME
 
     def _report_plate_dqc(samples: pd.DataFrame):
 
@@ -456,3 +1607,212 @@ class Workflow():
             passing_avg_qccr=lambda x: x['avg_qccr'] >= avg_qccr_threshold)
 
         return report
+
+
+def _load_dqc_cache(cache_file: Path):
+    with _DQC_CACHE_LOCK:
+        if cache_file.exists():
+            return utils.load(cache_file)
+        return {'headers': dict(), 'records': dict()}
+
+
+def _update_dqc_cache(cache_file: Path, records: dict, headers: dict):
+    with _DQC_CACHE_LOCK:
+        if cache_file.exists():
+            cache = utils.load(cache_file)
+        else:
+            cache = {'headers': dict(), 'records': dict()}
+        cache['records'].update(records)
+        cache['headers'].update(headers)
+        utils.save(cache, cache_file)
+        return cache
+
+
+def _read_comment_lines(filepath: Path):
+    lines = []
+    with filepath.open('rt') as fh:
+        for line in fh:
+            if not line.startswith('#%'):
+                break
+            lines.append(line)
+    return lines
+
+
+def _check_posteriors(posteriors_file: Path):
+    if not posteriors_file.exists():
+        raise Exception(
+            f'{posteriors_file} not found; probeset QC needs the posteriors '
+            'of a single genotyping run, run it per batch for mega-batches')
+
+
+def _export_genders(report_file: Path, gender_file: Path):
+    report = utils.tsv2df(report_file)
+
+    genders = report[['cel_files', 'computed_gender']].rename(
+        columns={'computed_gender': 'gender'})
+
+    utils.df2tsv(genders, gender_file)
+
+
+def _merge_back(snv_dir: Path, subset_dir: Path, filename: str):
+    default_file = snv_dir / filename
+    subset_file = subset_dir / filename
+
+    if not default_file.exists() or not subset_file.exists():
+        return
+
+    merged_file = default_file.with_name(f'{default_file.name}.tmp')
+    utils.merge_static_column_file(default_file, subset_file, merged_file)
+    merged_file.replace(default_file)
+
+
+def _assemble_shards(shards: dict, output_dir: Path):
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    # only names written by an earlier assembly are removed; anything else
+    # in output_dir, including failed shards and their logs, is left alone
+    assembly_file = output_dir / config.ASSEMBLY_FILENAME
+    if assembly_file.exists():
+        for name in utils.load(assembly_file):
+            _remove_entry(output_dir / name)
+        assembly_file.unlink()
+
+    names = {
+        x.name
+        for shard_dir in shards.values() for x in shard_dir.iterdir()
+        if x.suffix != '.log'
+    }
+
+    shard_roots = {
+        x.relative_to(output_dir).parts[0]
+        for x in shards.values() if x.is_relative_to(output_dir)
+    }
+    if names & shard_roots:
+        raise Exception(f'{output_dir}: shard outputs would overwrite '
+                        f'{sorted(names & shard_roots)}')
+
+    written = []
+    for name in sorted(names):
+        written += _assemble_entry(
+            {k: v / name
+             for k, v in shards.items() if (v / name).exists()},
+            output_dir / name,
+        )
+
+    utils.save([x.name for x in written], assembly_file)
+
+
+def _remove_entry(filepath: Path):
+    if filepath.is_dir() and not filepath.is_symlink():
+        shutil.rmtree(filepath)
+    else:
+        filepath.unlink(missing_ok=True)
+
+
+def _assemble_entry(srcs: dict, dst: Path):
+    if all(x.is_dir() for x in srcs.values()):
+        _remove_entry(dst)
+        dst.mkdir()
+        names = {x.name for src in srcs.values() for x in src.iterdir()}
+        for name in sorted(names):
+            _assemble_entry(
+                {k: v / name
+                 for k, v in srcs.items() if (v / name).exists()},
+                dst / name,
+            )
+        return [dst]
+
+    if not all(x.is_file() for x in srcs.values()):
+        raise Exception(f'{dst}: shards mix files and directories')
+
+    is_table = dst.suffix in {'.txt', '.tsv'}
+
+    # tables such as Ps.performance.txt are written whole by every shard
+    digests = {_content_digest(x, is_table) for x in srcs.values()}
+    if len(digests) == 1:
+        _remove_entry(dst)
+        utils.link_or_copy(next(iter(srcs.values())), dst)
+        return [dst]
+
+    if is_table:
+        _remove_entry(dst)
+        headers = {_read_header(x) for x in srcs.values()}
+        if len(headers) == 1:
+            utils.concat_rows(list(srcs.values()), dst)
+        else:
+            utils.paste_columns(list(srcs.values()), dst)
+        return [dst]
+
+    # binary outputs cannot be merged, so each shard keeps its own
+    written = []
+    for shard, src in srcs.items():
+        shard_dst = dst.with_name(f'{dst.stem}.{shard}{dst.suffix}')
+        _remove_entry(shard_dst)
+        utils.link_or_copy(src, shard_dst)
+        written.append(shard_dst)
+    return written
+
+
+def _content_digest(filepath: Path, skip_comments: bool):
+    digest = hashlib.blake2b(digest_size=16)
+
+    with filepath.open('rb') as fh:
+        if skip_comments:
+            for line in fh:
+                if not line.startswith(b'#'):
+                    digest.update(line)
+        else:
+            for chunk in iter(lambda: fh.read(1 << 20), b''):
+                digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _read_header(filepath: Path):
+    with utils.open_text(filepath) as fh:
+        for line in fh:
+            if not line.startswith('#'):
+                return line
+
+    raise Exception(f'{filepath}: no header')
+
+
+def _sample_stem(name: str, sample_stems: set):
+    matches = [x for x in sample_stems if name.startswith(x)]
+    if not matches:
+        return None
+    return max(matches, key=len)
+
+
+def _run_translation(cmd, output_dir: Path):
+    try:
+        cmd.execute()
+    except Exception as e:
+        return str(e).splitlines()[0]
+
+    log_file = output_dir / 'apt-dmet-translation.log'
+
+    if not log_file.exists():
+        return f'{log_file} not found'
+    if cmd.apt_crashed(log_file):
+        return f'errors reported in {log_file}'
+
+    return None
+
+
+def _qccr_report(call_rates: pd.DataFrame, sqc_args: SampleQcArguments):
+
+    qccr_report = call_rates.rename(columns={'call_rate': 'qccr'})
+    qccr_report = qccr_report.round(10)
+
+    qccr_report = qccr_report.assign(
+        passing_qccr=lambda x: x['qccr'] >= sqc_args.qccr_threshold)
+
+    failed = qccr_report[lambda x: x['passing_qccr'] == False]
+
+    for _, record in failed.iterrows():
+        cel_name = record['cel_name']
+        qccr = record['qccr']
+        logging.info(f'QCCR\t{cel_name}\t{qccr:5.2f}\tfailed')
+
+    return qccr_report
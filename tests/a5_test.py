@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+h5py = pytest.importorskip('h5py')
+
+from apt import a5
+
+
+def test_summaries_iter(tmp_path):
+    a5_file = tmp_path / 'AxiomGT1.summary.a5'
+
+    with h5py.File(a5_file, 'w') as fh:
+        group = fh.create_group('summary')
+        group['probeset_id'] = np.array([b'AX-1-A', b'AX-1-B', b'AX-2-A'])
+        group['a.CEL'] = np.array([1.0, 2.0, 3.0])
+        group['b.CEL'] = np.array([4.0, 5.0, 6.0])
+
+    chunks = list(a5.summaries_iter(a5_file, chunk_rows=2))
+
+    assert len(chunks) == 2
+    assert chunks[0]['samples'] == ['a.CEL', 'b.CEL']
+    assert list(chunks[0]['probeset_ids']) == ['AX-1-A', 'AX-1-B']
+    assert chunks[1]['signals'].tolist() == [[3.0, 6.0]]
+
+
+def test_export_summaries(tmp_path):
+    a5_file = tmp_path / 'AxiomGT1.summary.a5'
+
+    with h5py.File(a5_file, 'w') as fh:
+        group = fh.create_group('summary')
+        group['probeset_id'] = np.array([b'AX-1-A', b'AX-1-B'])
+        group['a.CEL'] = np.array([1.0, 2.0])
+        group['b.CEL'] = np.array([4.5, 5.0])
+
+    summary_file = a5.export_summaries(a5_file,
+                                       tmp_path / 'AxiomGT1.summary.txt',
+                                       precision=1)
+
+    assert summary_file.read_text().splitlines() == [
+        'probeset_id\ta.CEL\tb.CEL',
+        'AX-1-A\t1.0\t4.5',
+        'AX-1-B\t2.0\t5.0',
+    ]
@@ -0,0 +1,19 @@
+from apt import args_file
+
+
+def test_read_args_file(tmp_path):
+    filepath = tmp_path / 'Axiom_Foo.r1.apt-genotype-axiom.AxiomGT1.Step2.apt2.xml'
+    filepath.write_text(''
+                        '<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<ApplicationData>\n'
+                        '  <Parameter name="probeset-ids" analysis="library-file-node" currentValue="Foo.ps"/>\n'
+                        '  <Parameter name="probeset-ids" analysis="library-file-node" currentValue="Bar.ps"/>\n'
+                        '  <Parameter name="process-multi-alleles" analysis="multi-genotyping-node" currentValue="true"/>\n'
+                        '</ApplicationData>\n'
+                        '')
+
+    args = args_file.read_args_file(filepath)
+
+    assert args[('library-file-node', 'probeset-ids')] == 'Foo.ps'
+    assert args_file.read_args_file(filepath) is args
+    assert args_file.process_multi_alleles(args)
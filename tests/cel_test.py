@@ -0,0 +1,55 @@
+from apt import cel
+
+
+def test_read_calvin_header(tmp_path, write_calvin_cel):
+    cel_file = tmp_path / 'foo.CEL'
+    write_calvin_cel(cel_file)
+
+    header = cel.read_cel_header(cel_file)
+
+    assert header['format'] == 'calvin'
+    assert header['array_type'] == 'Axiom_Foo'
+    assert header['barcode'] == '5500000001-A01'
+    assert header['sbarcode'] == '5500000001'
+    assert header['scan_date'] == '2024-01-01T10:00:00Z'
+    assert (header['rows'], header['cols']) == (4, 4)
+
+
+def test_scan_cel_headers(tmp_path, write_calvin_cel):
+    write_calvin_cel(tmp_path / 'foo.CEL')
+    (tmp_path / 'bar.CEL').write_bytes(b'garbage')
+    cache_file = tmp_path / 'cel_headers.pkl.gz'
+
+    headers = cel.scan_cel_headers(
+        [tmp_path / 'foo.CEL', tmp_path / 'bar.CEL'],
+        n_jobs=2,
+        cache_file=cache_file,
+    )
+
+    assert headers['cel_name'].tolist() == ['foo.CEL', 'bar.CEL']
+    assert headers['array_type'].tolist()[0] == 'Axiom_Foo'
+    assert headers['error'].isna().tolist() == [True, False]
+    assert cache_file.exists()
+
+
+def test_validate_cels(tmp_path, write_calvin_cel):
+    write_calvin_cel(tmp_path / 'ok.CEL')
+    write_calvin_cel(tmp_path / 'other.CEL', array_type='Axiom_Bar')
+    write_calvin_cel(tmp_path / 'truncated.CEL')
+    data = (tmp_path / 'truncated.CEL').read_bytes()
+    (tmp_path / 'truncated.CEL').write_bytes(data[0:-8])
+
+    report = cel.validate_cels(
+        [
+            tmp_path / 'ok.CEL',
+            tmp_path / 'other.CEL',
+            tmp_path / 'truncated.CEL',
+        ],
+        array_name='Axiom_Foo',
+    )
+
+    errors = report['error'].tolist()
+
+    assert report['error'].isna().tolist() == [True, False, False]
+    assert 'Axiom_Bar' in errors[1]
+    assert 'Intensity' in errors[2]
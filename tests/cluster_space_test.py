@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+
+from apt import cluster_space
+
+
+def test_load_cluster_space(tmp_path):
+    summary_file = tmp_path / 'AxiomGT1.summary.txt'
+    summary_file.write_text(''
+                            '#%summary\n'
+                            'probeset_id\tfoo.CEL\tbar.CEL\n'
+                            'AX-100-A\t8\t2\n'
+                            'AX-100-B\t2\t8\n'
+                            'AFFX-NP-1\t1\t1\n'
+                            'AX-200-A\t4\t4\n'
+                            'AX-200-B\t4\t4\n'
+                            '')
+
+    space = cluster_space.load_cluster_space(summary_file)
+
+    assert space.probeset_ids == ['AX-100', 'AX-200']
+    assert space.samples == ['foo.CEL', 'bar.CEL']
+    assert space.contrast.dtype == np.float32
+    assert space.contrast[0].tolist() == [2, -2]
+    assert space.strength[0].tolist() == [2, 2]
+    assert space.row('AX-200')[0].tolist() == [0, 0]
+
+    summary_file.write_text(''
+                            'probeset_id\tfoo.CEL\n'
+                            'AX-300-A\t2\n'
+                            'AX-300-B\t8\n'
+                            '')
+    os.utime(summary_file, ns=(0, 0))
+
+    space = cluster_space.load_cluster_space(summary_file)
+
+    assert space.probeset_ids == ['AX-300']
+    assert space.contrast[0].tolist() == [-2]
+
+
+def test_load_cluster_space_empty(tmp_path):
+    summary_file = tmp_path / 'AxiomGT1.summary.txt'
+    summary_file.write_text('probeset_id\tfoo.CEL\n')
+
+    space = cluster_space.load_cluster_space(summary_file)
+
+    assert space.probeset_ids == []
+    assert space.contrast.shape == (0, 1)
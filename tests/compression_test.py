@@ -0,0 +1,50 @@
+import threading
+
+from apt import utils
+from apt.compression import Compressor
+
+
+def test_compressor(tmp_path):
+    trustcheck_file = tmp_path / 'AxiomGT1.trustcheck.txt'
+    trustcheck_file.write_text('#%x=1\nprobeset_id\ta.CEL\nAX-1\t0.5\n')
+
+    compressor = Compressor()
+    compressor.submit([trustcheck_file, tmp_path / 'missing.txt'])
+    compressor.wait()
+    compressor.shutdown()
+
+    assert not trustcheck_file.exists()
+    assert (tmp_path / 'AxiomGT1.trustcheck.txt.gz').exists()
+
+    assert utils.read_sample_columns(trustcheck_file) == ['a.CEL']
+
+    assert utils.ensure_uncompressed(trustcheck_file) == trustcheck_file
+    assert trustcheck_file.read_text().endswith('AX-1\t0.5\n')
+
+
+def test_compressor_in_flight(tmp_path):
+    trustcheck_file = tmp_path / 'AxiomGT1.trustcheck.txt'
+    trustcheck_file.write_text('#%x=1\nprobeset_id\ta.CEL\nAX-1\t0.5\n')
+
+    compressor = Compressor(n_jobs=1)
+
+    # hold the only worker so the compression stays pending
+    blocked = threading.Event()
+    compressor._executor.submit(blocked.wait)
+    compressor.submit([trustcheck_file])
+
+    resolved = []
+    reader = threading.Thread(
+        target=lambda: resolved.append(
+            utils.ensure_uncompressed(trustcheck_file)))
+    reader.start()
+    reader.join(0.2)
+
+    assert reader.is_alive()
+
+    blocked.set()
+    reader.join()
+    compressor.shutdown()
+
+    assert resolved == [trustcheck_file]
+    assert trustcheck_file.read_text().endswith('AX-1\t0.5\n')
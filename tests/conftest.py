@@ -0,0 +1,71 @@
+import struct
+
+import pytest
+
+
+def _string(value):
+    return struct.pack('>i', len(value)) + value.encode('ascii')
+
+
+def _wstring(value):
+    return struct.pack('>i', len(value)) + value.encode('utf-16-be')
+
+
+def _param(name, value):
+    if isinstance(value, int):
+        raw, mime_type = struct.pack('>i', value), 'text/x-calvin-integer-32'
+    else:
+        raw, mime_type = value.encode('utf-16-be'), 'text/plain'
+    return _wstring(name) + struct.pack('>i', len(raw)) + raw + _wstring(
+        mime_type)
+
+
+def _generic_data_header(params, parents=()):
+    data = _string('affymetrix-calvin-intensity')
+    data += _string('0000-0000')
+    data += _wstring('2024-01-01T00:00:00Z')
+    data += _wstring('en-US')
+    data += struct.pack('>i', len(params))
+    for name, value in params.items():
+        data += _param(name, value)
+    data += struct.pack('>i', len(parents))
+    for parent in parents:
+        data += parent
+    return data
+
+
+def _write_calvin_cel(filepath, array_type='Axiom_Foo', rows=4, cols=4):
+    parent = _generic_data_header({
+        'affymetrix-scan-date': '2024-01-01T10:00:00Z',
+        'affymetrix-plate-barcode': '5500000001',
+    })
+    header = _generic_data_header(
+        {
+            'affymetrix-array-type': array_type,
+            'affymetrix-array-barcode': '5500000001-A01',
+            'affymetrix-cel-rows': rows,
+            'affymetrix-cel-cols': cols,
+        },
+        parents=[parent],
+    )
+    data_group_pos = 10 + len(header)
+    data_group = struct.pack('>I', 0)
+    data_set_pos = data_group_pos + 12 + len(_wstring('Default Group'))
+    data_group += struct.pack('>Ii', data_set_pos, 1)
+    data_group += _wstring('Default Group')
+
+    data_set = _wstring('Intensity') + struct.pack('>i', 0)
+    data_set += struct.pack('>I', 1) + _wstring('Intensity')
+    data_set += struct.pack('>bi', 6, 4) + struct.pack('>I', rows * cols)
+    first_element_pos = data_set_pos + 8 + len(data_set)
+    data_set = struct.pack('>II', first_element_pos, 0) + data_set
+    data_set += b'\x00' * 4 * rows * cols
+
+    filepath.write_bytes(
+        struct.pack('>BBiI', 59, 1, 1, data_group_pos) + header + data_group +
+        data_set)
+
+
+@pytest.fixture
+def write_calvin_cel():
+    return _write_calvin_cel
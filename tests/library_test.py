@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from apt import library, utils
+
+
+def test_library_manifest(tmp_path):
+    for filename in [
+            'Axiom_Foo.r1.annot.db',
+            'Axiom_Foo.r1.ps2snp_map.ps',
+            'Axiom_Foo.r1.cn_models',
+            'Axiom_Bar.r1.cn_models',
+    ]:
+        (tmp_path / filename).touch()
+
+    manifest = library.get_manifest(tmp_path)
+
+    assert library.get_manifest(tmp_path) is manifest
+    assert manifest.find_file('*.annot.db') == tmp_path / 'Axiom_Foo.r1.annot.db'
+    assert manifest.find_file('*.cn_models') == tmp_path / 'Axiom_Bar.r1.cn_models'
+    assert manifest.find_file('Axiom_Foo.r1.ps2snp_map.ps')
+    assert manifest.find_file('*.psct', missing_ok=True) is None
+
+    with pytest.raises(Exception):
+        manifest.find_file('*.psct')
+
+    (tmp_path / 'Axiom_Foo.r1.psct').touch()
+    os.utime(tmp_path, ns=(0, 0))
+
+    manifest = library.get_manifest(tmp_path)
+
+    assert manifest.find_file('*.psct') == tmp_path / 'Axiom_Foo.r1.psct'
+
+
+def test_get_array_name(tmp_path):
+    (tmp_path / 'Axiom_Foo.r1.ax_package').write_text(
+        '{"array_name": "Axiom_Foo", "lib_set_version": "r1"}')
+
+    assert utils.get_array_name(tmp_path) == 'Axiom_Foo'
+    assert utils.find_file(tmp_path, '*.ax_package') == (
+        tmp_path / 'Axiom_Foo.r1.ax_package').resolve()
+    assert tmp_path.resolve() in library._MANIFESTS
+
+
+def test_library_manifest_symlink(tmp_path):
+    lib_dir = tmp_path / 'lib'
+    lib_dir.mkdir()
+    (tmp_path / 'Axiom_Foo.r1.annot.db').touch()
+    (lib_dir / 'Axiom_Foo.r1.annot.db').symlink_to(
+        tmp_path / 'Axiom_Foo.r1.annot.db')
+
+    assert library.get_manifest(lib_dir).find_file('*.annot.db') == (
+        tmp_path / 'Axiom_Foo.r1.annot.db').resolve()
@@ -0,0 +1,63 @@
+import numpy as np
+
+from apt import config, query
+
+
+def _write(filepath, lines):
+    filepath.write_text(''.join(f'{x}\n' for x in lines))
+
+
+def test_query_cluster_data(tmp_path):
+    snv_dir = tmp_path / config.SNV_DIRNAME
+    snv_dir.mkdir()
+
+    _write(snv_dir / config.CALLS_FILENAME, [
+        '#%calls',
+        'probeset_id\tfoo.CEL\tbar.CEL',
+        'AX-100\t0\t1',
+        'AX-200\t2\t-1',
+    ])
+    _write(snv_dir / config.CONFIDENCES_FILENAME, [
+        'probeset_id\tfoo.CEL\tbar.CEL',
+        'AX-100\t0.01\t0.02',
+        'AX-200\t0.03\t0.2',
+    ])
+    _write(snv_dir / config.SUMMARY_FILENAME, [
+        'probeset_id\tbar.CEL\tfoo.CEL',
+        'AX-100-A\t20\t10',
+        'AX-100-B\t21\t11',
+        'AX-200-A\t40\t30',
+        'AX-200-B\t41\t31',
+    ])
+    _write(snv_dir / config.POSTERIORS_FILENAME, [
+        '#%SnpPosteriorFormatVer=1',
+        'id\tBB\tAB\tAA\tCV',
+        'AX-100\t-1,0.02,20,20,10,0.1,0\t0,0.03,30,30,10,0.1,0'
+        '\t1,0.02,40,40,10,0.1,0\t0.5,0.5,0.5,0.5,0.5',
+        'AX-200\t-2,0.02,20,20,11,0.1,0\t0,0.03,30,30,11,0.1,0'
+        '\t2,0.02,40,40,11,0.1,0\t0.1,0.2,0.3,0.4,0.5',
+    ])
+
+    index_dir = tmp_path / 'index'
+
+    result = query.query_cluster_data(
+        ['AX-200', 'AX-999'],
+        [tmp_path],
+        index_dir,
+    )[0]
+
+    assert result['samples'] == ['foo.CEL', 'bar.CEL']
+    assert result['found'].tolist() == [True, False]
+    assert result['calls'].tolist() == [[2, -1], [-1, -1]]
+    assert result['a'][0].tolist() == [30, 40]
+    assert result['b'][0].tolist() == [31, 41]
+    assert np.isnan(result['a'][1]).all()
+    assert result['clusters'] == ['BB', 'AB', 'AA']
+    assert result['posteriors'].shape == (2, 3, 7)
+    assert result['posteriors'][0, 2, 0] == 2
+    assert np.isnan(result['posteriors'][1]).all()
+    assert result['cv'].shape == (2, 5)
+    np.testing.assert_allclose(result['cv'][0], [0.1, 0.2, 0.3, 0.4, 0.5])
+
+    assert not list(snv_dir.glob('*.idx'))
+    assert len(list(index_dir.glob(f'{config.CALLS_FILENAME}.*.idx'))) == 1
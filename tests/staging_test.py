@@ -0,0 +1,79 @@
+from apt import config
+from apt.staging import Stager, StagingSession
+
+
+def test_stager(tmp_path):
+    src_dir = tmp_path / 'src'
+    src_dir.mkdir()
+    for name in ['a.CEL', 'b.CEL', 'c.CEL']:
+        (src_dir / name).write_bytes(b'x' * 10)
+
+    stager = Stager(tmp_path / 'scratch', max_bytes=25)
+
+    staged_a = stager.stage(src_dir / 'a.CEL')
+    assert staged_a.read_bytes() == b'x' * 10
+    assert config.STAGING_DIRNAME in staged_a.parts
+    assert stager.stage(src_dir / 'a.CEL') == staged_a
+
+    # a.CEL is pinned twice; one release keeps it staged
+    stager.release([src_dir / 'a.CEL'])
+    stager.prefetch([src_dir / 'b.CEL', src_dir / 'c.CEL'])
+    staged_c = stager.stage(src_dir / 'c.CEL')
+
+    assert staged_a.exists()
+    assert staged_c.exists()
+    assert stager.n_bytes == 20
+
+    stager.release([src_dir / 'a.CEL', src_dir / 'c.CEL'])
+    stager.stage(src_dir / 'b.CEL')
+
+    assert not staged_a.exists()
+    assert stager.n_bytes == 20
+
+    stager.shutdown()
+
+
+def test_staging_session(tmp_path):
+    src_dir = tmp_path / 'src'
+    src_dir.mkdir()
+    for name in ['a.CEL', 'b.CEL', 'c.CEL']:
+        (src_dir / name).write_bytes(b'x' * 10)
+
+    stager = Stager(tmp_path / 'scratch', max_bytes=20)
+
+    session_a = StagingSession(stager)
+    session_b = StagingSession(stager)
+
+    staged_a = session_a.stage(src_dir / 'a.CEL')
+    session_b.stage(src_dir / 'b.CEL')
+
+    session_b.release()
+
+    # releasing one session must not unpin the files of another
+    session_b.stage(src_dir / 'c.CEL')
+    session_b.release()
+
+    assert staged_a.exists()
+
+    session_a.release()
+
+    assert StagingSession(None).stage(src_dir / 'a.CEL') == src_dir / 'a.CEL'
+
+    stager.shutdown()
+
+
+def test_stage_symlink(tmp_path):
+    src_dir = tmp_path / 'src'
+    src_dir.mkdir()
+    (src_dir / 'blob').write_bytes(b'x' * 10)
+    (src_dir / 'a.CEL').symlink_to(src_dir / 'blob')
+
+    stager = Stager(tmp_path / 'scratch', max_bytes=25)
+
+    staged = stager.stage(src_dir / 'a.CEL')
+
+    assert staged.name == 'a.CEL'
+    assert staged.read_bytes() == b'x' * 10
+
+    stager.release([src_dir / 'a.CEL'])
+    stager.shutdown()
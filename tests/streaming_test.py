@@ -0,0 +1,65 @@
+import threading
+import time
+
+from apt import streaming, utils
+
+
+def test_tail_lines(tmp_path):
+    calls_file = tmp_path / 'AxiomGT1.calls.txt'
+    done = threading.Event()
+
+    def write():
+        with calls_file.open('wt') as fh:
+            fh.write('#%x=1\nprobeset_id\ta.CEL\tb.CEL\n')
+            fh.flush()
+            for i in range(5):
+                time.sleep(0.01)
+                fh.write(f'AX-{i}\t{i % 2 - 1}')
+                fh.flush()
+                fh.write('\t0\n')
+                fh.flush()
+        done.set()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+
+    accumulator = streaming.CallRateAccumulator(block_size=2)
+    lines = []
+    for line in streaming.tail_lines(calls_file, done, poll_interval=0.005):
+        lines.append(line)
+        accumulator.feed(line)
+
+    thread.join()
+
+    assert ''.join(lines) == calls_file.read_text()
+    assert accumulator.report().equals(
+        utils.call_rate_from_calls_file(calls_file))
+
+
+def test_call_rate_accumulator_no_rows():
+    accumulator = streaming.CallRateAccumulator()
+    accumulator.feed('probeset_id\ta.CEL\n')
+
+    report = accumulator.report()
+
+    assert list(report['cel_name']) == ['a.CEL']
+    assert report['call_rate'].isna().all()
+
+
+def test_execute_streaming_rewrite(tmp_path):
+    calls_file = tmp_path / 'AxiomGT1.calls.txt'
+
+    class RewritingCommand():
+
+        def execute(self):
+            calls_file.write_text('probeset_id\ta.CEL\nAX-1\t0\nAX-2\t1\n')
+            time.sleep(0.5)
+            calls_file.write_text('probeset_id\ta.CEL\nAX-1\t0\n')
+
+    lines = []
+
+    assert not streaming.execute_streaming(
+        RewritingCommand(),
+        calls_file,
+        [lines.append],
+    )
@@ -0,0 +1,39 @@
+import pytest
+
+from apt.summary_store import SummaryStore
+
+
+def _write_summary(filepath, samples):
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    with filepath.open('wt') as fh:
+        fh.write('\t'.join(['probeset_id'] + samples) + '\n')
+        for probeset_id in ['AX-1-A', 'AX-1-B']:
+            fh.write('\t'.join([probeset_id] + ['1.0'] * len(samples)) + '\n')
+    return filepath
+
+
+def test_summary_store(tmp_path):
+    store = SummaryStore(tmp_path / 'store')
+
+    store.add_chunk(
+        _write_summary(store.next_chunk_dir() / 'summary.txt',
+                       ['a.CEL', 'b.CEL']))
+    store.add_chunk(
+        _write_summary(store.next_chunk_dir() / 'summary.txt', ['c.CEL']))
+
+    with pytest.raises(Exception):
+        store.add_chunk(
+            _write_summary(tmp_path / 'dup' / 'summary.txt', ['a.CEL']))
+
+    store = SummaryStore(tmp_path / 'store')
+
+    assert store.samples == ['a.CEL', 'b.CEL', 'c.CEL']
+
+    summary_file, trustcheck_file = store.combine(tmp_path / 'combined')
+
+    assert trustcheck_file is None
+    assert summary_file.read_text().splitlines() == [
+        'probeset_id\ta.CEL\tb.CEL\tc.CEL',
+        'AX-1-A\t1.0\t1.0\t1.0',
+        'AX-1-B\t1.0\t1.0\t1.0',
+    ]
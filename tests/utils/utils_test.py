@@ -2,6 +2,8 @@ from apt import utils
 from pathlib import Path
 import filecmp
 
+import pytest
+
 #           defualt mod merged	merged_target	merged_target_improved
 # AX-100    x           x       x               x
 # AX-200    x       x   x       x               x
@@ -58,3 +60,115 @@ def test_merge_static_column_file(tmp_path):
         actual_target_improved_file,
         shallow=False,
     )
+
+
+def test_paste_columns(tmp_path):
+    file1 = tmp_path / 'batch1.txt'
+    file2 = tmp_path / 'batch2.txt'
+    file1.write_text('#%x=1\nprobeset_id\ta.CEL\nAX-1\t0\nAX-2\t1\n')
+    file2.write_text('#%x=2\nprobeset_id\tb.CEL\tc.CEL\nAX-1\t2\t1\nAX-2\t0\t0\n')
+
+    merged_file = tmp_path / 'merged.txt'
+
+    utils.paste_columns([file1, file2], merged_file)
+
+    assert merged_file.read_text() == (
+        '#%x=1\n'
+        'probeset_id\ta.CEL\tb.CEL\tc.CEL\n'
+        'AX-1\t0\t2\t1\n'
+        'AX-2\t1\t0\t0\n')
+
+    file2.write_text('probeset_id\tb.CEL\nAX-2\t0\nAX-1\t2\n')
+
+    with pytest.raises(Exception, match='expected AX-1'):
+        utils.paste_columns([file1, file2], merged_file)
+
+
+def test_drop_sample_columns(tmp_path):
+    summary_file = tmp_path / 'summary.txt'
+    summary_file.write_text('#%x=1\n'
+                            'probeset_id\ta.CEL\tb.CEL\tc.CEL\n'
+                            'AX-1-A\t1.0\t2.0\t3.0\n'
+                            'AX-1-B\t4.0\t5.0\t6.0\n')
+
+    reduced_file = tmp_path / 'reduced.txt'
+
+    utils.drop_sample_columns(summary_file, reduced_file, {'b.CEL'})
+
+    assert reduced_file.read_text() == ('#%x=1\n'
+                                        'probeset_id\ta.CEL\tc.CEL\n'
+                                        'AX-1-A\t1.0\t3.0\n'
+                                        'AX-1-B\t4.0\t6.0\n')
+
+
+def test_split_sample_columns(tmp_path):
+    calls_file = tmp_path / 'calls.txt'
+    calls_file.write_text('#%x=1\n'
+                          'probeset_id\ta.CEL\tb.CEL\tc.CEL\n'
+                          'AX-1\t0\t1\t2\n')
+
+    shard_files = [tmp_path / 'shard1.txt', tmp_path / 'shard2.txt']
+
+    utils.split_sample_columns(
+        calls_file,
+        shard_files,
+        [['a.CEL', 'b.CEL'], ['c.CEL']],
+    )
+
+    assert shard_files[0].read_text() == ('#%x=1\n'
+                                          'probeset_id\ta.CEL\tb.CEL\n'
+                                          'AX-1\t0\t1\n')
+    assert shard_files[1].read_text() == ('#%x=1\n'
+                                          'probeset_id\tc.CEL\n'
+                                          'AX-1\t2\n')
+
+
+def test_subset_rows_by_column(tmp_path):
+    calls_file = tmp_path / 'calls.txt'
+    calls_file.write_text('#%x=1\n'
+                          'cn_region\tcel_files\tcall\n'
+                          'CYP2D6\ta.CEL\t2\n'
+                          'CYP2D6\tb.CEL\t1\n')
+
+    subset_file = tmp_path / 'subset.txt'
+
+    utils.subset_rows(
+        calls_file,
+        subset_file,
+        {'b.CEL'},
+        key_column='cel_files',
+    )
+
+    assert subset_file.read_text() == ('#%x=1\n'
+                                       'cn_region\tcel_files\tcall\n'
+                                       'CYP2D6\tb.CEL\t1\n')
+
+    with pytest.raises(Exception):
+        utils.subset_rows(calls_file, subset_file, {'b.CEL'}, key_column='x')
+
+
+def test_split_file(tmp_path):
+    summary_file = tmp_path / 'summary.txt'
+    summary_file.write_text('#%x=1\n'
+                            'probeset_id\ta.CEL\n'
+                            'AX-1-A\t1.0\n'
+                            'AX-1-B\t2.0\n'
+                            'AX-2-A\t3.0\n'
+                            'AX-3-A\t4.0\n')
+
+    shard_files = [tmp_path / 'shard1.txt', tmp_path / 'shard2.txt']
+
+    written = utils.split_file(
+        summary_file,
+        shard_files,
+        {'AX-1': 0, 'AX-3': 1},
+    )
+
+    assert written == ['AX-1', 'AX-3']
+    assert shard_files[0].read_text() == ('#%x=1\n'
+                                          'probeset_id\ta.CEL\n'
+                                          'AX-1-A\t1.0\n'
+                                          'AX-1-B\t2.0\n')
+    assert shard_files[1].read_text() == ('#%x=1\n'
+                                          'probeset_id\ta.CEL\n'
+                                          'AX-3-A\t4.0\n')
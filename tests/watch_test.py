@@ -0,0 +1,59 @@
+import os
+
+from apt.watch import PlateWatcher
+
+
+class FakeWorkflow():
+
+    def __init__(self):
+        self.dqc_samples = []
+
+    def validate_cels(self, samples, lib_dir, output_dir):
+        return samples
+
+    def dqc(self, samples, lib_dir, output_dir, sqc_args, force, **kwargs):
+        self.dqc_samples.append(list(samples['cel_path']))
+        return samples.assign(
+            cel_name=[os.path.basename(x) for x in samples['cel_path']],
+            dqc=0.9,
+            passing_dqc=True,
+        )[['cel_name', 'dqc', 'passing_dqc']]
+
+
+def test_plate_watcher(tmp_path, write_calvin_cel):
+    intake_dir = tmp_path / 'intake'
+    intake_dir.mkdir()
+
+    write_calvin_cel(intake_dir / 'foo.CEL')
+    (intake_dir / 'bar.CEL').write_bytes(b'partial')
+    (intake_dir / 'gone.CEL').symlink_to(tmp_path / 'missing.CEL')
+
+    workflow = FakeWorkflow()
+
+    watcher = PlateWatcher(
+        workflow,
+        intake_dir,
+        tmp_path,
+        tmp_path / 'output',
+        sqc_args=None,
+        plate_size=2,
+        settle_seconds=0,
+    )
+
+    assert watcher.poll()
+    assert watcher.pending_plates == ['5500000001']
+    assert workflow.dqc_samples == []
+
+    # an unchanged failed CEL is not read again
+    assert not watcher.poll()
+
+    write_calvin_cel(intake_dir / 'bar.CEL')
+    os.utime(intake_dir / 'bar.CEL', ns=(0, 0))
+
+    assert watcher.poll()
+    assert watcher.pending_plates == []
+    assert [os.path.basename(x) for x in workflow.dqc_samples[0]] == [
+        'bar.CEL',
+        'foo.CEL',
+    ]
+    assert len(watcher.sample_qc) == 2
@@ -0,0 +1,499 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from apt import config, workflow
+from apt.workflow import Workflow
+
+GENO_QC = '''#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --cel-files) cels=$2; shift;;
+        --out-file) out=$2; shift;;
+    esac
+    shift
+done
+echo run >> "$(dirname "$out")/runs"
+printf '#%%guid=1234\\n#%%affymetrix-algorithm-name=dqc\\n' > "$out"
+printf 'cel_files\\taxiom_dishqc_DQC\\n' >> "$out"
+tail -n +2 "$cels" | while read cel; do
+    printf '%s\\t0.9\\n' "$(basename "$cel")" >> "$out"
+done
+'''
+
+SUMMARY_GENOTYPE = '''#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --out-dir) out=$2; shift;;
+        --read-genders) genders=$2; shift;;
+        --probeset-ids) probesets=$2; shift;;
+    esac
+    shift
+done
+cp "$genders" "$out/genders_used.tsv"
+printf 'probeset_id\\ta.CEL\\tb.CEL\\n' > "$out/AxiomGT1.calls.txt"
+printf 'probeset_id\\ta.CEL\\tb.CEL\\n' > "$out/AxiomGT1.confidences.txt"
+tail -n +2 "$probesets" | while read ps; do
+    printf '%s\\t2\\t2\\n' "$ps" >> "$out/AxiomGT1.calls.txt"
+    printf '%s\\t0.5\\t0.5\\n' "$ps" >> "$out/AxiomGT1.confidences.txt"
+done
+echo '#    info     1 816 | 0 error(s) and 0 warning(s).'
+'''
+
+PS_CLASSIFICATION = '''#!/bin/sh
+while [ $# -gt 0 ]; do
+    case "$1" in
+        --output-dir) out=$2; shift;;
+    esac
+    shift
+done
+printf 'probeset_id\\nAX-2\\n' > "$out/OffTargetVariant.ps"
+printf 'probeset_id\\nAX-3\\n' > "$out/Recommended.ps"
+echo '#    info     1 816 | 0 error(s) and 0 warning(s).'
+'''
+
+STATUS_OK = '''#!/bin/sh
+echo '#    info     1 816 | 0 error(s) and 0 warning(s).'
+'''
+
+
+@pytest.fixture
+def bin_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'APT_CMDS_CACHE_FILE',
+                        tmp_path / 'apt_cmds.json')
+
+    bin_dir = tmp_path / 'bin'
+    bin_dir.mkdir()
+
+    for program in config.APT_PROGRAMS:
+        _write_program(bin_dir / program, '#!/bin/sh\n')
+
+    return bin_dir
+
+
+def _write_program(filepath, content):
+    filepath.write_text(content)
+    filepath.chmod(0o755)
+
+
+def test_dqc_cache(tmp_path, bin_dir):
+    _write_program(bin_dir / 'apt-geno-qc-axiom', GENO_QC)
+
+    cels = []
+    for name in ['foo.CEL', 'bar.CEL', 'baz.CEL']:
+        cel_file = tmp_path / name
+        cel_file.write_text(name)
+        cels.append(cel_file)
+
+    args_file = tmp_path / 'qc.xml'
+    args_file.write_text('<xml/>')
+
+    sqc_args = SimpleNamespace(
+        geno_qc_args_file=args_file,
+        snp_priors_file=None,
+        dqc_threshold=0.82,
+    )
+
+    output_dir = tmp_path / 'dqc'
+    runs_file = output_dir / 'runs'
+    geno_qc_file = output_dir / config.GENO_QC_FILENAME
+
+    workflow = Workflow(apt_bin_dir=bin_dir)
+
+    def dqc(cel_files, force=False):
+        samples = pd.DataFrame({
+            'cel_path': [str(x) for x in cel_files],
+            'cel_order': range(len(cel_files)),
+        })
+        return workflow.dqc(
+            samples,
+            tmp_path,
+            output_dir,
+            sqc_args,
+            force=force,
+            validate=False,
+        )
+
+    report = dqc(cels[0:2])
+
+    assert report['cel_name'].tolist() == ['foo.CEL', 'bar.CEL']
+    assert len(runs_file.read_text().splitlines()) == 1
+
+    report = dqc([cels[1], cels[0]])
+
+    assert report['cel_name'].tolist() == ['bar.CEL', 'foo.CEL']
+    assert len(runs_file.read_text().splitlines()) == 1
+
+    lines = geno_qc_file.read_text().splitlines()
+    assert lines[0:2] == [
+        '#%guid=1234',
+        '#%affymetrix-algorithm-name=dqc',
+    ]
+    assert lines[2:] == [
+        'cel_files\taxiom_dishqc_DQC',
+        'bar.CEL\t0.9',
+        'foo.CEL\t0.9',
+    ]
+
+    report = dqc(cels)
+
+    assert report['cel_name'].tolist() == ['foo.CEL', 'bar.CEL', 'baz.CEL']
+    assert len(runs_file.read_text().splitlines()) == 2
+
+    dqc(cels[0:1], force=True)
+
+    assert len(runs_file.read_text().splitlines()) == 3
+
+
+def test_dqc_cache_same_name(tmp_path, bin_dir):
+    _write_program(bin_dir / 'apt-geno-qc-axiom', GENO_QC)
+
+    # same basename and size, differing only in the middle
+    cels = []
+    for dirname, middle in [('a', b'A'), ('b', b'B')]:
+        cel_file = tmp_path / dirname / 'foo.CEL'
+        cel_file.parent.mkdir()
+        cel_file.write_bytes(b'x' * (3 << 20) + middle + b'x' * (3 << 20))
+        cels.append(cel_file)
+
+    args_file = tmp_path / 'qc.xml'
+    args_file.write_text('<xml/>')
+
+    sqc_args = SimpleNamespace(
+        geno_qc_args_file=args_file,
+        snp_priors_file=None,
+        dqc_threshold=0.82,
+    )
+
+    output_dir = tmp_path / 'dqc'
+    workflow = Workflow(apt_bin_dir=bin_dir)
+
+    for n_runs, cel_files in enumerate([cels[0:1], cels[1:2], cels], 1):
+        report = workflow.dqc(
+            pd.DataFrame({
+                'cel_path': [str(x) for x in cel_files],
+                'cel_order': range(len(cel_files)),
+            }),
+            tmp_path,
+            output_dir,
+            sqc_args,
+            force=False,
+            validate=False,
+        )
+        assert len(report) == len(cel_files)
+        assert len((output_dir / 'runs').read_text().splitlines()) == min(
+            n_runs, 2)
+
+
+def test_dqc_drops_invalid_cels(tmp_path, bin_dir):
+    _write_program(bin_dir / 'apt-geno-qc-axiom', GENO_QC)
+
+    (tmp_path / 'Axiom_Foo.r1.ax_package').write_text(
+        '{"array_name": "Axiom_Foo", "lib_set_version": "r1"}')
+
+    cel_file = tmp_path / 'foo.CEL'
+    cel_file.write_text('not a CEL file')
+
+    output_dir = tmp_path / 'dqc'
+
+    report = Workflow(apt_bin_dir=bin_dir).dqc(
+        pd.DataFrame({'cel_path': [str(cel_file)], 'cel_order': [0]}),
+        tmp_path,
+        output_dir,
+        SimpleNamespace(geno_qc_args_file=None, snp_priors_file=None),
+        force=False,
+    )
+
+    assert len(report) == 0
+    assert report['passing_dqc'].dtype == bool
+    assert len(report[lambda x: x['passing_dqc']]['cel_name']) == 0
+    assert not (output_dir / 'runs').exists()
+    assert (output_dir / config.CEL_CHECK_REPORT_FILENAME).exists()
+
+
+def test_sample_qc_pipelined(tmp_path, bin_dir):
+    samples = pd.DataFrame({
+        'cel_path': [str(tmp_path / f'{i}.CEL') for i in range(6)],
+    })
+
+    workflow = Workflow(apt_bin_dir=bin_dir)
+    qccr_sizes = []
+
+    def dqc(samples, **kwargs):
+        cel_names = [Path(x).name for x in samples['cel_path']]
+        if cel_names == ['0.CEL']:
+            # every CEL of this chunk failed validation
+            cel_names = []
+        return pd.DataFrame({
+            'cel_name': pd.Series(cel_names, dtype='str'),
+            'dqc': pd.Series([0.9] * len(cel_names), dtype='float64'),
+            'passing_dqc': pd.Series([True] * len(cel_names), dtype='bool'),
+        })
+
+    def qccr(samples, **kwargs):
+        qccr_sizes.append(len(samples))
+        return pd.DataFrame({
+            'cel_name': [Path(x).name for x in samples['cel_path']],
+            'qccr': 99.0,
+            'passing_qccr': True,
+        })
+
+    workflow.dqc = dqc
+    workflow.qccr = qccr
+
+    dqc_report, qccr_report = workflow.sample_qc_pipelined(
+        samples,
+        tmp_path,
+        None,
+        tmp_path / 'qc',
+        force=False,
+        dqc_chunk_size=1,
+        min_qccr_chunk_size=2,
+        n_jobs=1,
+    )
+
+    assert len(dqc_report) == 5
+    assert len(qccr_report) == 5
+    # the leftover sample joins the last chunk instead of running alone
+    assert sorted(qccr_sizes) == [2, 3]
+
+
+def _write(filepath, lines):
+    filepath.write_text(''.join(f'{x}\n' for x in lines))
+
+
+def test_regenotype_probesets(tmp_path, bin_dir, monkeypatch):
+    _write_program(bin_dir / 'apt-summary-genotype-axiom', SUMMARY_GENOTYPE)
+
+    snv_dir = tmp_path / 'snv'
+    snv_dir.mkdir()
+
+    _write(snv_dir / config.CALLS_FILENAME, [
+        '#%calls',
+        'probeset_id\ta.CEL\tb.CEL',
+        'AX-1\t0\t0',
+        'AX-2\t0\t1',
+        'AX-3\t1\t1',
+    ])
+    _write(snv_dir / config.CONFIDENCES_FILENAME, [
+        'probeset_id\ta.CEL\tb.CEL',
+        'AX-1\t0.01\t0.01',
+        'AX-2\t0.01\t0.01',
+        'AX-3\t0.01\t0.01',
+    ])
+    _write(snv_dir / config.SUMMARY_FILENAME, [
+        'probeset_id\ta.CEL\tb.CEL',
+        'AX-1-A\t1\t1',
+        'AX-1-B\t1\t1',
+        'AX-2-A\t2\t2',
+        'AX-2-B\t2\t2',
+        'AX-3-A\t3\t3',
+        'AX-3-B\t3\t3',
+    ])
+    _write(snv_dir / config.POSTERIORS_FILENAME, [
+        'id\tBB\tAB\tAA',
+        'AX-2\t1,1\t2,2\t3,3',
+    ])
+    _write(snv_dir / config.REPORT_FILENAME, [
+        '#%report',
+        'cel_files\tcomputed_gender\tcall_rate',
+        'a.CEL\tfemale\t99.1',
+        'b.CEL\tmale\t98.7',
+    ])
+
+    probesets_file = tmp_path / 'changed.ps'
+    _write(probesets_file, ['probeset_id', 'AX-2'])
+
+    snv_args = SimpleNamespace(
+        step2_args_file=None,
+        snp_priors_file=None,
+        snp_params_file=None,
+        special_snps_file=None,
+        lib_dir=tmp_path,
+        copynumber_call_codes=None,
+        rare_het_adjustment=False,
+        probeset_ids_file=None,
+    )
+
+    workflow = Workflow(apt_bin_dir=bin_dir)
+    monkeypatch.setattr(workflow, 'snv_qc_incremental', lambda **x: None)
+
+    assert workflow.regenotype_probesets(
+        probesets_file,
+        snv_dir,
+        snv_args,
+    ) == {'AX-2'}
+
+    work_dir = snv_dir / config.TMP_DIRNAME / probesets_file.stem
+
+    assert (work_dir / 'genders_used.tsv').read_text().splitlines() == [
+        'cel_files\tgender',
+        'a.CEL\tfemale',
+        'b.CEL\tmale',
+    ]
+    assert (snv_dir / config.CALLS_FILENAME).read_text().splitlines() == [
+        '#%calls',
+        'probeset_id\ta.CEL\tb.CEL',
+        'AX-1\t0\t0',
+        'AX-2\t2\t2',
+        'AX-3\t1\t1',
+    ]
+    assert (snv_dir /
+            config.CONFIDENCES_FILENAME).read_text().splitlines()[2] == (
+                'AX-2\t0.5\t0.5')
+
+
+def test_snv_qc_incremental(tmp_path, bin_dir):
+    _write_program(bin_dir / 'ps-metrics', STATUS_OK)
+    _write_program(bin_dir / 'ps-classification', PS_CLASSIFICATION)
+
+    snv_dir = tmp_path / 'snv'
+    snv_dir.mkdir()
+
+    _write(snv_dir / config.CALLS_FILENAME, [
+        'probeset_id\ta.CEL',
+        'AX-1\t0',
+        'AX-2\t0',
+        'AX-3\t0',
+    ])
+    _write(snv_dir / config.SUMMARY_FILENAME, [
+        'probeset_id\ta.CEL',
+        'AX-1-A\t1',
+        'AX-1-B\t1',
+        'AX-2-A\t1',
+        'AX-2-B\t1',
+        'AX-3-A\t1',
+        'AX-3-B\t1',
+    ])
+    _write(snv_dir / config.POSTERIORS_FILENAME, [
+        'id\tBB\tAB\tAA',
+        'AX-1\t1,1\t2,2\t3,3',
+        'AX-2\t1,1\t2,2\t3,3',
+        'AX-3\t1,1\t2,2\t3,3',
+    ])
+    _write(snv_dir / 'Recommended.ps', ['probeset_id', 'AX-1', 'AX-2'])
+    _write(snv_dir / 'PolyHighResolution.ps', ['probeset_id', 'AX-1', 'AX-2'])
+    _write(snv_dir / 'NoMinorHom.ps', ['probeset_id', 'AX-3'])
+    _write(snv_dir / 'recall.ps', ['probeset_id', 'AX-2', 'AX-3'])
+
+    ps2snp_file = tmp_path / 'Axiom_Foo.r1.ps2snp_map.ps'
+    _write(ps2snp_file, [
+        'probeset_id\tsnpid',
+        'AX-1\tAffx-1',
+        'AX-2\tAffx-2',
+        'AX-3\tAffx-2',
+    ])
+
+    snv_args = SimpleNamespace(
+        ps_metrics_thresholds='',
+        ps_classification_thresholds='',
+        genotype_freq_file=None,
+        special_snps_file=None,
+        psct_file=None,
+        ps2snp_file=ps2snp_file,
+    )
+
+    affected = Workflow(apt_bin_dir=bin_dir).snv_qc_incremental(
+        probeset_ids={'AX-2'},
+        snv_dir=snv_dir,
+        snv_args=snv_args,
+        work_dir=tmp_path / 'qc',
+    )
+
+    def load(filename):
+        return (snv_dir / filename).read_text().splitlines()[1:]
+
+    assert affected == {'AX-2', 'AX-3'}
+    assert load('Recommended.ps') == ['AX-1', 'AX-3']
+    assert load('PolyHighResolution.ps') == ['AX-1']
+    assert load('NoMinorHom.ps') == []
+    assert load('OffTargetVariant.ps') == ['AX-2']
+    assert load('recall.ps') == ['AX-2', 'AX-3']
+
+
+def test_snv_qc_requires_posteriors(tmp_path, bin_dir):
+    with pytest.raises(Exception, match='posteriors'):
+        Workflow(apt_bin_dir=bin_dir).snv_qc_incremental(
+            probeset_ids={'AX-1'},
+            snv_dir=tmp_path,
+            snv_args=None,
+            work_dir=tmp_path / 'qc',
+        )
+
+
+def test_assemble_shards(tmp_path):
+    output_dir = tmp_path / 'package'
+    shards = dict()
+
+    for i, sample in enumerate(['a.CEL', 'b.CEL']):
+        shard_dir = output_dir / config.TMP_DIRNAME / f'batch_{i:04d}'
+        (shard_dir / 'plots').mkdir(parents=True)
+        _write(shard_dir / config.REPORT_FILENAME, [
+            f'#%guid={i}',
+            'cel_files\tcall_rate',
+            f'{sample}\t99',
+        ])
+        _write(shard_dir / config.CALLS_FILENAME, [
+            'probeset_id\t' + sample,
+            'AX-1\t0',
+            'AX-2\t1',
+        ])
+        _write(shard_dir / config.PS_PERFORMANCE_FILENAME, [
+            f'#%guid={i}',
+            'probeset_id\tCR',
+            'AX-1\t99',
+            'AX-2\t98',
+        ])
+        (shard_dir / 'plots' / f'{sample}.png').write_bytes(b'png')
+        (shard_dir / 'batch.mdb').write_bytes(bytes([i]))
+        (shard_dir / 'package.log').write_text('log')
+        shards[shard_dir.name] = shard_dir
+
+    (output_dir / 'notes.txt').write_text('notes')
+
+    for _ in range(2):
+        workflow._assemble_shards(shards, output_dir)
+
+        def load(filename):
+            return (output_dir / filename).read_text().splitlines()
+
+        assert load(config.REPORT_FILENAME)[1:] == [
+            'cel_files\tcall_rate',
+            'a.CEL\t99',
+            'b.CEL\t99',
+        ]
+        assert load(config.CALLS_FILENAME) == [
+            'probeset_id\ta.CEL\tb.CEL',
+            'AX-1\t0\t0',
+            'AX-2\t1\t1',
+        ]
+        assert len(load(config.PS_PERFORMANCE_FILENAME)) == 4
+        assert sorted(x.name for x in (output_dir / 'plots').iterdir()) == [
+            'a.CEL.png',
+            'b.CEL.png',
+        ]
+        assert (output_dir / 'batch.batch_0000.mdb').exists()
+        assert (output_dir / 'batch.batch_0001.mdb').exists()
+        assert (output_dir / 'notes.txt').exists()
+        assert not (output_dir / 'package.log').exists()
+        assert (output_dir / config.TMP_DIRNAME).exists()
+
+    # outputs of a shard that is no longer assembled are removed
+    workflow._assemble_shards({'batch_0000': shards['batch_0000']}, output_dir)
+
+    assert (output_dir / 'batch.mdb').exists()
+    assert not (output_dir / 'batch.batch_0001.mdb').exists()
+    assert (output_dir / 'notes.txt').exists()
+
+
+def test_assemble_shards_all_failed(tmp_path):
+    tx_dir = tmp_path / config.TRANSLATION_DIRNAME
+    shard_dir = tx_dir / 'shards' / 'shard_0000'
+    (shard_dir / 'out').mkdir(parents=True)
+    _write(shard_dir / 'out' / 'apt-dmet-translation.log', ['failed'])
+
+    workflow._assemble_shards({}, tx_dir)
+
+    assert (shard_dir / 'out' / 'apt-dmet-translation.log').exists()